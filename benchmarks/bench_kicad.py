@@ -0,0 +1,127 @@
+##########################################################
+#
+# Benchmark: parsing KiCad boards with the s-expression
+# lexer vs Python's tokenize module.
+#
+# The KiCad 6 example board is enlarged by repeating its
+# footprints. A KiCad 5 board is synthesised from it with
+# 'module' nodes and unquoted strings.
+#
+# >>> python benchmarks/bench_kicad.py
+#
+##########################################################
+import re
+import tempfile
+import time
+import tokenize
+import zipfile
+from importlib import resources
+from pathlib import Path
+from tokenize import ENDMARKER, LPAR, RPAR, NEWLINE, NL, INDENT, DEDENT, COMMENT
+from pinout import kicad2pinout as k2p
+
+REPEAT = 200
+NUMBER = 3
+
+# Python tokens that do not form part of an s-expression
+SKIP_TOKENS = {ENDMARKER, NEWLINE, NL, INDENT, DEDENT, COMMENT}
+
+
+def load_tree_tokenize(filepath):
+    """Parse a KiCad file into an s-expression tree with Python's tokenize,
+    the reference the lexer (kicad2pinout.load_tree) is compared with.
+
+    Nodes are lists with the node name as the first item. Atoms are strings,
+    quoted strings retain their quotes.
+
+    :param filepath: Path to KiCad file
+    :type filepath: str
+    :return: Root node
+    :rtype: list
+    """
+    root = []
+    stack = [root]
+    end = None
+    with tokenize.open(filepath) as f:
+        for tok in tokenize.generate_tokens(f.readline):
+            if tok.exact_type == LPAR:
+                node = []
+                stack[-1].append(node)
+                stack.append(node)
+            elif tok.exact_type == RPAR:
+                stack.pop()
+            elif tok.type in SKIP_TOKENS or tok.string.isspace():
+                # Whitespace can be reported as an error token, eg. before '$'
+                continue
+            elif tok.start == end and stack[-1] and isinstance(stack[-1][-1], str):
+                # tokenize splits atoms such as '-1.5' and 'F.Cu', rejoin them
+                stack[-1][-1] += tok.string
+            else:
+                stack[-1].append(tok.string)
+            end = tok.end
+    return root[0]
+
+
+def dumps(node, depth=0):
+    if isinstance(node, str):
+        return node
+    indent = "\n" + "  " * depth
+    return indent + "(" + " ".join(dumps(n, depth + 1) for n in node) + ")"
+
+
+def kicad_5(node):
+    """Convert a KiCad 6 tree to KiCad 5 syntax."""
+    if isinstance(node, str):
+        # KiCad 5 only quotes strings containing whitespace or parentheses
+        if re.fullmatch(r'"[^\s()"\\]+"', node):
+            return node[1:-1]
+        return node
+    node = [kicad_5(n) for n in node]
+    if node[0] == "footprint":
+        node[0] = "module"
+    elif node[0] == "version":
+        node[1] = "20171130"
+    return node
+
+
+def boards(folder):
+    example = resources.files("pinout") / "resources" / "pinout_kicad_example.zip"
+    with example.open("rb") as f:
+        zipfile.ZipFile(f).extractall(folder)
+    pcb = Path(folder, "pinout_kicad_example", "kicad_6_pcb", "kicad_6_pcb.kicad_pcb")
+
+    tree = k2p.load_tree(pcb)
+    footprints = [n for n in tree if isinstance(n, list) and n[0] == "footprint"]
+    tree += footprints * REPEAT
+
+    kicad_6 = Path(folder, "kicad_6.kicad_pcb")
+    kicad_6.write_text(dumps(tree))
+    kicad_5_pcb = Path(folder, "kicad_5.kicad_pcb")
+    kicad_5_pcb.write_text(dumps(kicad_5(tree)))
+    return {"KiCad 5": kicad_5_pcb, "KiCad 6": kicad_6}
+
+
+def best_time(func, *args):
+    times = []
+    for _ in range(NUMBER):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as folder:
+        print(
+            f"{'board':<10}{'size (MB)':>10}{'tokenize (s)':>14}{'lexer (s)':>11}"
+            f"{'speedup':>10}"
+        )
+        for name, pcb in boards(folder).items():
+            size = pcb.stat().st_size / 1e6
+            tokenize_time, tokenize_tree = best_time(load_tree_tokenize, pcb)
+            lexer_time, lexer_tree = best_time(k2p.load_tree, pcb)
+            assert lexer_tree == tokenize_tree, f"{name} trees differ"
+            print(
+                f"{name:<10}{size:>10.2f}{tokenize_time:>14.3f}{lexer_time:>11.3f}"
+                f"{tokenize_time / lexer_time:>9.1f}x"
+            )
@@ -0,0 +1,95 @@
+##########################################################
+#
+# Benchmark: memory allocated per PinLabel in a large
+# diagram, before and after rendering, compared with the
+# pinout package at a git revision (HEAD by default).
+#
+# >>> python benchmarks/bench_memory.py [revision]
+#
+##########################################################
+import gc
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import tracemalloc
+from pathlib import Path
+from pinout.components.layout import Diagram
+from pinout.components.pinlabel import PinLabel
+
+LABELS = 2000
+REPO = Path(__file__).resolve().parent.parent
+
+
+def build():
+    diagram = Diagram(1000, 1000)
+    diagram.add_stylesheet("styles.css")
+    for i in range(LABELS):
+        diagram.add(
+            PinLabel(
+                content=f"GPIO{i}",
+                x=10,
+                y=i * 10,
+                tag="gpio",
+                body={"x": 20, "y": 0, "width": 60, "height": 20},
+            )
+        )
+    return diagram
+
+
+def allocated(func):
+    """Bytes allocated by 'func' and still held when it returns."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def measure():
+    """Bytes per label held after building, and after rendering, the diagram."""
+    diagram, built = allocated(build)
+    # Markup cached by components is retained, the returned document is not
+    _, rendered = allocated(lambda: diagram.render() and None)
+    return {"build": built / LABELS, "render": (built + rendered) / LABELS}
+
+
+def measure_revision(revision):
+    """Measure the pinout package at a git revision in a separate process."""
+    archive = subprocess.run(
+        ["git", "archive", revision, "pinout"],
+        cwd=REPO,
+        capture_output=True,
+        check=True,
+    ).stdout
+    with tempfile.TemporaryDirectory() as folder:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(folder)
+        result = subprocess.run(
+            [sys.executable, __file__, "--measure"],
+            env={**os.environ, "PYTHONPATH": folder},
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--measure"]:
+        print(json.dumps(measure()))
+        sys.exit()
+
+    revision = sys.argv[1] if len(sys.argv) > 1 else "HEAD"
+    baseline = measure_revision(revision)
+    current = measure()
+    print(f"{'stage':<10}{revision:>14}{'current':>14}{'change':>10}")
+    for stage, value in current.items():
+        change = (value - baseline[stage]) / baseline[stage]
+        print(f"{stage:<10}{baseline[stage]:>14.0f}{value:>14.0f}{change:>10.1%}")
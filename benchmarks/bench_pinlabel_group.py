@@ -0,0 +1,34 @@
+##########################################################
+#
+# Benchmark: PinLabelGroup construction time for headers
+# of increasing size, 3 labels per pin.
+#
+# >>> python benchmarks/bench_pinlabel_group.py
+#
+##########################################################
+import timeit
+from pinout.components.pinlabel import PinLabelGroup
+
+LABELS_PER_PIN = 3
+
+
+def build(pins):
+    labels = [
+        [(f"P{pin}_{i}", "gpio") for i in range(LABELS_PER_PIN)] for pin in range(pins)
+    ]
+    return PinLabelGroup(
+        x=0,
+        y=0,
+        pin_pitch=(0, 10),
+        label_start=(60, 0),
+        label_pitch=(0, 10),
+        labels=labels,
+    )
+
+
+if __name__ == "__main__":
+    print(f"{'pins':>6}{'total (ms)':>12}{'per label (us)':>16}")
+    for pins in (125, 250, 500, 1000):
+        seconds = min(timeit.repeat(lambda: build(pins), number=1, repeat=3))
+        per_label = seconds / (pins * LABELS_PER_PIN) * 1e6
+        print(f"{pins:>6}{seconds * 1e3:>12.1f}{per_label:>16.1f}")
@@ -0,0 +1,37 @@
+##########################################################
+#
+# Benchmark: formatting path coordinates, full float
+# repr() against a fixed precision, and the resulting
+# size of a diagram's markup.
+#
+# >>> python benchmarks/bench_precision.py
+#
+##########################################################
+import random
+import timeit
+from pinout import config, svg_tools
+from pinout.components.layout import Diagram
+from pinout.components.pinlabel import PinLabel
+
+random.seed(0)
+VALUES = [random.uniform(-1000, 1000) for _ in range(10000)]
+
+
+def build():
+    diagram = Diagram(1000, 1000)
+    diagram.add_stylesheet("styles.css")
+    for i in range(500):
+        diagram.add(
+            PinLabel(f"GPIO{i}", x=i / 3, y=i * 7 / 3, body={"x": 100 / 7, "y": 10 / 3})
+        )
+    return diagram
+
+
+if __name__ == "__main__":
+    print(f"{'precision':<12}{'format (ms)':>14}{'bytes':>12}")
+    for precision in (None, 3, 1):
+        fmt = repr if precision is None else svg_tools.number_formatter(precision)
+        seconds = min(timeit.repeat(lambda: [fmt(v) for v in VALUES], number=10))
+        config.output["precision"] = precision
+        size = len(build().render())
+        print(f"{str(precision):<12}{seconds * 100:>14.2f}{size:>12}")
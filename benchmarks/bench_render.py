@@ -0,0 +1,41 @@
+##########################################################
+#
+# Benchmark: per-element render time of primitive
+# components with the built-in serializer vs Jinja templates.
+#
+# >>> python benchmarks/bench_render.py
+#
+##########################################################
+import timeit
+from pinout.core import Circle, Path, Rect, Text, Use
+
+NUMBER = 5000
+
+components = {
+    "Rect": (
+        Rect(x=10, y=20, width=80, height=26, corner_radius=3, tag="a"),
+        "rect.svg",
+    ),
+    "Text": (Text("GPIO 1", x=10, y=20, tag="pinlabel__text"), "text.svg"),
+    "Path": (Path("M 0 0 L 10 10 L 20 0", tag="leader"), "path.svg"),
+    "Circle": (Circle(10, 10, 5), "circle.svg"),
+    "Use": (Use(Rect(), x=10, y=10), "use.svg"),
+}
+
+
+def per_element(component):
+    def render():
+        # Discard cached markup so serialization is measured
+        component._markup = None
+        return component.render()
+
+    return timeit.timeit(render, number=NUMBER) / NUMBER * 1e6
+
+
+if __name__ == "__main__":
+    print(f"{'component':<10}{'jinja (us)':>12}{'built-in (us)':>15}{'speedup':>10}")
+    for name, (component, template) in components.items():
+        builtin = per_element(component)
+        component.template = template
+        jinja = per_element(component)
+        print(f"{name:<10}{jinja:>12.2f}{builtin:>15.2f}{jinja / builtin:>9.1f}x")
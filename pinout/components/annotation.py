@@ -49,21 +49,31 @@ class AnnotationLabel(Group):
         # content relied on body - must come after
         self.content = content
 
-        # Route leaderline once other elements exist
-        self._leaderline.route(self.target, self.body)
-
-        self.add(self.leaderline)
+        # Leaderline is routed and added at render
         self.add(self.target)
         self.add(self.body)
         self.add(self.content)
 
+    def build_key(self):
+        return (
+            self._leaderline,
+            self._target.bounding_coords(),
+            self._body.bounding_coords(),
+            config.output["precision"],
+        )
+
+    def build(self):
+        # Route leaderline once other elements exist, beneath them
+        self.leaderline.route(self.target, self.body)
+        self.insert(0, self.leaderline)
+
     @property
     def content(self):
         return self._content
 
     @content.setter
     def content(self, content):
-        content = copy.deepcopy(content or {})
+        content = content or {}
         config = self.config["content"]
         # Parse content: str > list > dict > TextBlock
         if type(content) is str:
@@ -76,8 +86,10 @@ class AnnotationLabel(Group):
                 - (config["line_height"] * (len(content) - 1) / 2 * self.scale.y),
             }
         if isinstance(content, dict):
-            config.update(content)
-            content = Content(**config)
+            self.config["content"] = {**config, **content}
+            content = Content(**self.config["content"])
+        else:
+            content = copy.deepcopy(content)
         content.add_tag(self.config["content"]["tag"])
         content.scale = self.scale
         self._content = content
@@ -88,13 +100,16 @@ class AnnotationLabel(Group):
 
     @leaderline.setter
     def leaderline(self, leaderline):
-        leaderline = copy.deepcopy(leaderline or {})
+        leaderline = leaderline or {}
         if isinstance(leaderline, dict):
-            leaderline_config = self.config["leaderline"]
-            leaderline_config.update(leaderline)
-            leaderline = Leaderline(**leaderline_config)
+            if leaderline:
+                self.config["leaderline"] = {**self.config["leaderline"], **leaderline}
+            leaderline = Leaderline(**self.config["leaderline"])
+        else:
+            leaderline = copy.deepcopy(leaderline)
         leaderline.add_tag(self.config["leaderline"]["tag"])
         self._leaderline = leaderline
+        self.modified()
 
     @property
     def target(self):
@@ -102,13 +117,16 @@ class AnnotationLabel(Group):
 
     @target.setter
     def target(self, target):
-        target = copy.deepcopy(target or {})
+        target = target or {}
         if isinstance(target, dict):
-            target_config = self.config["target"]
-            target_config.update(target)
-            target = Target(**target_config)
+            if target:
+                self.config["target"] = {**self.config["target"], **target}
+            target = Target(**self.config["target"])
+        else:
+            target = copy.deepcopy(target)
         target.add_tag(self.config["target"]["tag"])
         self._target = target
+        self.modified()
 
     @property
     def body(self):
@@ -116,10 +134,13 @@ class AnnotationLabel(Group):
 
     @body.setter
     def body(self, body):
-        body = copy.deepcopy(body or {})
+        body = body or {}
         if isinstance(body, dict):
-            body_config = self.config["body"]
-            body_config.update(body)
-            body = Body(**body_config)
+            if body:
+                self.config["body"] = {**self.config["body"], **body}
+            body = Body(**self.config["body"])
+        else:
+            body = copy.deepcopy(body)
         body.add_tag(self.config["body"]["tag"])
         self._body = body
+        self.modified()
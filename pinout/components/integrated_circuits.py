@@ -1,6 +1,6 @@
-import math
 from pinout.core import Group, SvgShape, Rect, BoundingCoords, Coords
 from pinout import config
+from pinout.transform import Transform, trig
 from pinout.components.pinlabel import PinLabelGroup
 from pinout.components.leaderline import Curved
 
@@ -22,7 +22,10 @@ class Pin(Group):
             )
         )
 
-    def render(self):
+    def build_key(self):
+        return (self._width, self._height, self.polarity_mark)
+
+    def build(self):
         self.add(
             Rect(
                 x=-self._width / 2,
@@ -45,7 +48,6 @@ class Pin(Group):
                     tag=self.config["tag"],
                 )
             )
-        return super().render()
 
 
 class DIP(Group):
@@ -71,8 +73,9 @@ class DIP(Group):
 
     @property
     def pitch_coords(self):
-        pitch_x = math.cos(math.radians(self.rotate)) * self.pin_pitch
-        pitch_y = math.sin(math.radians(self.rotate)) * self.pin_pitch
+        cos, sin = trig(self.rotate)
+        pitch_x = cos * self.pin_pitch
+        pitch_y = sin * self.pin_pitch
         return Coords(pitch_x, pitch_y)
 
     def pin_coords(self, index, rotate=True):
@@ -89,14 +92,14 @@ class DIP(Group):
 
         # calculate for rotation
         if rotate:
-            rotate = math.radians(self.rotate)
-            rx = math.cos(rotate) * x - math.sin(rotate) * y
-            ry = math.sin(rotate) * x + math.cos(rotate) * y
-            return Coords(rx, ry)
+            return Coords(*Transform.rotation(self.rotate).apply(x, y))
 
         return Coords(x, y)
 
-    def render(self):
+    def build_key(self):
+        return (self.pin_count, self._width, self._height, self.inset)
+
+    def build(self):
         # Add body
         x1, y1, x2, y2 = self.inset
         self.add(
@@ -129,8 +132,6 @@ class DIP(Group):
                 )
             )
 
-        return super().render()
-
 
 class QFP(Group):
     """Create a quad flat package graphic"""
@@ -154,8 +155,9 @@ class QFP(Group):
 
     @property
     def pitch_coords(self):
-        pitch_x = math.cos(math.radians(self.rotate)) * self.pin_pitch
-        pitch_y = math.sin(math.radians(self.rotate)) * self.pin_pitch
+        cos, sin = trig(self.rotate)
+        pitch_x = cos * self.pin_pitch
+        pitch_y = sin * self.pin_pitch
         return Coords(pitch_x, pitch_y)
 
     def pin_coords(self, index, rotate=True):
@@ -189,14 +191,14 @@ class QFP(Group):
 
         # calculate for rotation
         if rotate:
-            rotate = math.radians(self.rotate)
-            rx = math.cos(rotate) * x - math.sin(rotate) * y
-            ry = math.sin(rotate) * x + math.cos(rotate) * y
-            return Coords(rx, ry)
+            return Coords(*Transform.rotation(self.rotate).apply(x, y))
 
         return Coords(x, y)
 
-    def render(self):
+    def build_key(self):
+        return (self.pin_count, self.length, self.inset)
+
+    def build(self):
         # Add body
         x1, y1, x2, y2 = self.inset
         self.add(
@@ -238,8 +240,6 @@ class QFP(Group):
                 )
             )
 
-        return super().render()
-
 
 def labelled_qfn(labels, length=160, label_start=(100, 20), label_pitch=(0, 30)):
     """Generate a QFP graphic with pin-labels applied."""
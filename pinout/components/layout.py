@@ -1,30 +1,110 @@
-import uuid
-from pinout import templates, config
+from pinout import config
 from pinout.core import (
+    Component,
+    IdScope,
+    Image,
     Layout,
     StyleSheet,
     Group,
     SvgShape,
     Rect,
     BoundingCoords,
+    field,
 )
 
 
 class Diagram(Layout):
     """Basis of a pinout diagram"""
 
-    def __init__(self, width, height, tag=None, **kwargs):
-        self.width = width
-        self.height = height
+    width = field("width")
+    height = field("height")
+
+    def __init__(self, width, height, tag=None, id_prefix="p", **kwargs):
+        self._width = width
+        self._height = height
+        # Ids of referenced components are issued from the diagram's scope
+        self.ids = IdScope(id_prefix)
         super().__init__(tag=tag, **kwargs)
         self.add(SvgShape(width=width, height=height))
 
     def add_stylesheet(self, path, embed=False):
         """Add a stylesheet to the diagram"""
-        self.children.insert(0, StyleSheet(path, embed))
+        self.insert(0, StyleSheet(path, embed))
+
+    def build(self):
+        """Embedded images used more than once are added to defs once and
+        referenced with <use> tags."""
+        embedded = {}
+        for image in self.find_children_by_type(self, Image):
+            if image.embed and not isinstance(image.src, Image):
+                embedded.setdefault(image.embed_key(), []).append(image)
+
+        self.shared_images = {}
+        for key, images in embedded.items():
+            if len(images) > 1:
+                shared = Image(images[0].src, dpi=images[0].dpi, embed=True)
+                self.add_def(shared)
+                self.shared_images[key] = shared
+
+    def build_key(self):
+        return tuple(
+            image.embed_key()
+            for image in self.find_children_by_type(self, Image)
+            if image.embed and not isinstance(image.src, Image)
+        )
+
+    def unbuild(self):
+        super().unbuild()
+        for shared in getattr(self, "shared_images", {}).values():
+            self.defs.remove(shared)
+        self.shared_images = {}
+
+    def iter_components(self):
+        """Generate every component rendered by the diagram once, in render
+        order. Clip-paths, defs and referenced components are included.
+
+        :return: Component instances
+        :rtype: generator
+        """
+        visited = set()
+
+        def visit(component):
+            if id(component) in visited:
+                return
+            visited.add(id(component))
+            yield component
+            children = [component.clip, *component.defs, *component.references()]
+            children += getattr(component, "children", [])
+            for child in children:
+                if isinstance(child, Component):
+                    yield from visit(child)
 
-    def render(self):
+        return visit(self)
+
+    def assign_ids(self):
+        """Assign ids, from the diagram's scope, to components in defs and
+        components referenced by others. Ids are assigned in render order and
+        kept by each component, so repeated renders are identical.
+        """
+        for component in self.iter_components():
+            referenced = list(component.references())
+            referenced += [d for d in component.defs if isinstance(d, Component)]
+            for instance in referenced:
+                if not instance.referenced:
+                    instance.id = self.ids()
+
+    def iter_render(self):
         """Render children into an <svg> tag."""
+        # Path data generated by build() (eg. leaderlines) is rounded to the
+        # output precision, components with it in their build key are rebuilt
+        precision = config.output["precision"]
+        if getattr(self, "_precision", precision) != precision:
+            for component in self.iter_components():
+                component._materialised = False
+        self._precision = precision
+        if not self._materialised:
+            self.materialise()
+            self.assign_ids()
 
         # Warn user if no styles have been added
         stylesheets = self.find_children_by_type(self, StyleSheet)
@@ -42,23 +122,30 @@ class Diagram(Layout):
                 """
             )
 
-        tplt = templates.get("svg.svg")
-        return tplt.render(svg=self)
+        yield from self.iter_template(
+            "svg.svg",
+            {"defs": self.iter_defs(), "children": self.iter_children()},
+            svg=self,
+        )
 
 
 class Panel(Layout):
+    width = field("width")
+    height = field("height")
+    inset = field("inset")
+
     def __init__(self, width, height, inset=None, **kwargs):
         """Assist with content grouping and positioning"""
 
-        self.width = width
-        self.height = height
+        self._width = width
+        self._height = height
 
         kwargs["config"] = kwargs.get("config", config.panel)
 
         super().__init__(**kwargs)
 
         inset = inset or self.config["inset"]
-        self.inset = BoundingCoords(*inset)
+        self._inset = BoundingCoords(*inset)
         self.add_tag(config.panel["tag"])
 
         # add a non-rendering shape so component
@@ -84,10 +171,13 @@ class Panel(Layout):
     def inset_height(self):
         return self.height - (self.inset.y1 + self.inset.y2)
 
-    def render(self):
-        """Panel renders children into a <group> tag."""
+    def build_key(self):
+        return (self.width, self.height, self.inset)
 
-        self.children.insert(
+    def build(self):
+        """Panel adds rects filling its outer and inner dimensions."""
+
+        self.insert(
             0,
             Rect(
                 width=self.width - (self.inset.x1 + self.inset.x2),
@@ -96,7 +186,7 @@ class Panel(Layout):
             ),
         )
         # Insert a rect filling the outer component dimensions
-        self.children.insert(
+        self.insert(
             0,
             Rect(
                 x=-self.inset.x1,
@@ -107,8 +197,12 @@ class Panel(Layout):
             ),
         )
 
-        tplt = templates.get("group.svg")
-        return tplt.render(group=self)
+    def iter_render(self):
+        """Panel renders children into a <group> tag."""
+
+        yield from self.iter_template(
+            "group.svg", {"children": self.iter_children()}, group=self
+        )
 
 
 class Diagram_2Columns(Diagram):
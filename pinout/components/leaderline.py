@@ -1,23 +1,39 @@
 import math
-from pinout import core
+from pinout import core, svg_tools
 
 
 class Leaderline(core.Path):
     """Leaderline base object."""
 
+    __slots__ = ("direction", "start", "end")
+
     def __init__(self, direction="hh", **kwargs):
         self.direction = direction
         self.start = core.Coords(0, 0)
         self.end = core.Coords(0, 0)
         super().__init__(**kwargs)
 
+    @staticmethod
+    def route_coords(origin, destination):
+        """Bounding coords of origin and destination in a common coordinate
+        space. A destination in a different layout to the origin is mapped
+        into the origin's layout via their world transforms.
+        """
+        o_coords = origin.bounding_coords()
+        d_coords = destination.bounding_coords()
+        o_parent = origin.parent
+        d_parent = destination.parent
+        if o_parent is not d_parent and None not in (o_parent, d_parent):
+            transform = o_parent.world_transform.inverse() @ d_parent.world_transform
+            d_coords = core.BoundingCoords(*transform.bounds(d_coords))
+        return o_coords, d_coords
+
     def end_points(self, origin, destination):
         """Locate origin and destination coordinates."""
         # origin and destination are components with bounding-boxes
         # direction is a 2 char code representing starting and ending directions
         # 'h' horizontal, 'v' vertical
-        o_coords = origin.bounding_coords()
-        d_coords = destination.bounding_coords()
+        o_coords, d_coords = self.route_coords(origin, destination)
 
         start = {
             "h": core.Coords(o_coords.x2, o_coords.y1 + origin.height / 2),
@@ -47,10 +63,12 @@ class Leaderline(core.Path):
 class Curved(Leaderline):
     """Leaderline comprised of one or two curved corners."""
 
+    __slots__ = ()
+
     def route(self, origin, destination):
 
-        o_coords = origin.bounding_coords()
-        d_coords = destination.bounding_coords()
+        fmt = svg_tools.formatter()
+        o_coords, d_coords = self.route_coords(origin, destination)
 
         r = min(abs(origin.x - destination.x), abs(origin.y - destination.y)) / 3
         len = (d_coords.x1 - o_coords.x2) / 8
@@ -63,40 +81,40 @@ class Curved(Leaderline):
             # start vertical, end horizontal
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {start.x} {end.y - r}",
-                    f"A {r} {r} 0 0 0 {start.x + r} {end.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(start.x)} {fmt(end.y - r)}",
+                    f"A {fmt(r)} {fmt(r)} 0 0 0 {fmt(start.x + r)} {fmt(end.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "hv":
             # start horizontal, end vertical
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {end.x - r} {start.y}",
-                    f"A {r} {r} 0 0 1 {end.x} {start.y + r}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x - r)} {fmt(start.y)}",
+                    f"A {fmt(r)} {fmt(r)} 0 0 1 {fmt(end.x)} {fmt(start.y + r)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "hh":
             # start horizontal, end horizontal
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {start.x + len} {start.y}",
-                    f"C {start.x + ctl_h} {start.y} {end.x - ctl_h} {end.y} {end.x - len} {end.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(start.x + len)} {fmt(start.y)}",
+                    f"C {fmt(start.x + ctl_h)} {fmt(start.y)} {fmt(end.x - ctl_h)} {fmt(end.y)} {fmt(end.x - len)} {fmt(end.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "vv":
             # start vertical, end vertical
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {start.x} {start.y + len}",
-                    f"C {start.x} {start.y + ctl_v} {end.x} {end.y - ctl_v} {end.x} {end.y - len}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(start.x)} {fmt(start.y + len)}",
+                    f"C {fmt(start.x)} {fmt(start.y + ctl_v)} {fmt(end.x)} {fmt(end.y - ctl_v)} {fmt(end.x)} {fmt(end.y - len)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         else:
@@ -110,44 +128,45 @@ class Angled(Leaderline):
 
     def route(self, origin, destination):
 
+        fmt = svg_tools.formatter()
         start, end = self.end_points(origin, destination)
 
         if self.direction == "vh":
             # start vertical, end horizontal
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {start.x} {end.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(start.x)} {fmt(end.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "hv":
             # start horizontal, end vertical
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {end.x} {start.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "hh":
             # start horizontal, end horizontal
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {start.x + (end.x - start.x)/4} {start.y}",
-                    f"L {start.x + (end.x - start.x)/4} {end.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(start.x + (end.x - start.x)/4)} {fmt(start.y)}",
+                    f"L {fmt(start.x + (end.x - start.x)/4)} {fmt(end.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "vv":
             # start vertical, end vertical
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {start.x} {start.y + (end.y - start.y)/4}",
-                    f"L {end.x} {start.y + (end.y - start.y)/4}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(start.x)} {fmt(start.y + (end.y - start.y)/4)}",
+                    f"L {fmt(end.x)} {fmt(start.y + (end.y - start.y)/4)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         else:
@@ -161,6 +180,7 @@ class Diagonal(Leaderline):
 
     def route(self, origin, destination):
 
+        fmt = svg_tools.formatter()
         start, end = self.end_points(origin, destination)
         x_dist = abs(start.x - end.x)
         y_dist = abs(start.y - end.y)
@@ -174,10 +194,10 @@ class Diagonal(Leaderline):
 
         path_def = " ".join(
             [
-                f"M {start.x} {start.y}",
-                f"L {start.x + min_dist - segment_x} {start.y + min_dist - segment_y}",
-                f"A {radius} {radius} 0 0 0  {start.x + min_dist + segment} {end.y}",
-                f"L {end.x} {end.y}",
+                f"M {fmt(start.x)} {fmt(start.y)}",
+                f"L {fmt(start.x + min_dist - segment_x)} {fmt(start.y + min_dist - segment_y)}",
+                f"A {fmt(radius)} {fmt(radius)} 0 0 0  {fmt(start.x + min_dist + segment)} {fmt(end.y)}",
+                f"L {fmt(end.x)} {fmt(end.y)}",
             ]
         )
 
@@ -189,13 +209,17 @@ class DiagonalAngled(Leaderline):
 
     def route(self, origin, destination):
 
+        fmt = svg_tools.formatter()
         start, end = self.end_points(origin, destination)
         x_dist = abs(start.x - end.x)
         y_dist = abs(start.y - end.y)
         min_dist = min(x_dist, y_dist)
 
         path_def = " ".join(
-            [f"M {start.x} {start.y}", f"l {min_dist} {min_dist}" f"L {end.x} {end.y}"]
+            [
+                f"M {fmt(start.x)} {fmt(start.y)}",
+                f"l {fmt(min_dist)} {fmt(min_dist)}" f"L {fmt(end.x)} {fmt(end.y)}",
+            ]
         )
 
         self.d = path_def
@@ -204,40 +228,43 @@ class DiagonalAngled(Leaderline):
 class Straight(Leaderline):
     """Leaderline comprised of a single straight line."""
 
+    __slots__ = ()
+
     def route(self, origin, destination):
 
+        fmt = svg_tools.formatter()
         start, end = self.end_points(origin, destination)
 
         if self.direction == "vh":
             # start vertical, end horizontal
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "hv":
             # start horizontal, end vertical
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "hh":
             # start horizontal, end horizontal
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         elif self.direction == "vv":
             # start vertical, end vertical
             path_def = " ".join(
                 [
-                    f"M {start.x} {start.y}",
-                    f"L {end.x} {end.y}",
+                    f"M {fmt(start.x)} {fmt(start.y)}",
+                    f"L {fmt(end.x)} {fmt(end.y)}",
                 ]
             )
         else:
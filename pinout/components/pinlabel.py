@@ -1,5 +1,6 @@
 import copy
-from pinout.core import SvgShape, Group, Rect, Text, BoundingCoords, Coords
+import math
+from pinout.core import SvgShape, Group, Rect, Text, BoundingCoords, Coords, field
 from pinout.components import leaderline as lline
 from pinout import config
 
@@ -16,8 +17,12 @@ def pitch_generator(start, pitch):
 class Body(SvgShape):
     """Graphical shape that makes up the body of a pinlabel."""
 
+    __slots__ = ("_corner_radius",)
+
+    corner_radius = field("corner_radius")
+
     def __init__(self, x, y, width, height, corner_radius=0, **kwargs):
-        self.corner_radius = corner_radius
+        self._corner_radius = corner_radius
         super().__init__(x=x, y=y, width=width, height=height, **kwargs)
 
     def bounding_coords(self):
@@ -29,7 +34,7 @@ class Body(SvgShape):
             self.y + (self.height / 2),
         )
 
-    def render(self):
+    def serialize(self):
         body = Rect(
             x=self.x,
             y=self.y - (self.height / 2),
@@ -44,12 +49,16 @@ class Body(SvgShape):
 class Leaderline(lline.Curved):
     """Graphical line joining the label origin coordinates to the label body."""
 
-    pass
+    __slots__ = ()
 
 
 class Base(Group):
     """Label component designed specifically for labelling pins."""
 
+    __slots__ = ("_content", "_leaderline", "_body")
+
+    content = field("content")
+
     def __init__(
         self,
         content="",
@@ -60,7 +69,7 @@ class Base(Group):
         leaderline=None,
         **kwargs,
     ):
-        self.content = content
+        self._content = content
         self._leaderline = None
         self._body = None
         super().__init__(x, y, tag=tag, **kwargs)
@@ -84,16 +93,19 @@ class Base(Group):
 
     @body.setter
     def body(self, body):
-        # ensure instance data is unique
-        body = copy.deepcopy(body or self.config["body"])
+        body = body or {}
         # Convert dict into body object
         if isinstance(body, dict):
-            body_config = self.config["body"]
-            body_config.update(body)
-            body = Body(**body_config)
-            # Add body config tag if not there
+            if body:
+                self.config["body"] = {**self.config["body"], **body}
+            body = Body(**self.config["body"])
+        else:
+            # ensure instance data is unique
+            body = copy.deepcopy(body)
+        # Add body config tag if not there
         body.add_tag(self.config["body"]["tag"])
         self._body = body
+        self.modified()
 
     @property
     def leaderline(self):
@@ -101,18 +113,38 @@ class Base(Group):
 
     @leaderline.setter
     def leaderline(self, leaderline):
-        # ensure instance data is unique
-        leaderline = copy.deepcopy(leaderline or self.config["leaderline"])
+        leaderline = leaderline or {}
         # Convert dict into leaderline object
         if isinstance(leaderline, dict):
-            leaderline_config = self.config["leaderline"]
-            leaderline_config.update(leaderline)
-            leaderline = Leaderline(**leaderline_config)
+            if leaderline:
+                self.config["leaderline"] = {
+                    **self.config["leaderline"],
+                    **leaderline,
+                }
+            leaderline = Leaderline(**self.config["leaderline"])
+        else:
+            # ensure instance data is unique
+            leaderline = copy.deepcopy(leaderline)
         # Add leaderline config tag if not there
         leaderline.add_tag(self.config["leaderline"]["tag"])
         self._leaderline = leaderline
+        self.modified()
+
+    def build_key(self):
+        body = self._body
+        return (
+            self.content,
+            body,
+            body.x,
+            body.y,
+            body.width,
+            body.height,
+            self._leaderline,
+            self.scale,
+            config.output["precision"],
+        )
 
-    def render(self):
+    def build(self):
         # Add text content
         x = self.body.width / 2 + self.body.x
         y = self.body.y
@@ -128,11 +160,33 @@ class Base(Group):
         # Route leaderline
         self.leaderline.route(Rect(), self._body)
         self.add(self.leaderline)
-        return super().render()
 
 
 class PinLabel(Base):
-    pass
+    __slots__ = ()
+
+
+def label_widths(body_x, body_w, lo, hi, scale_x):
+    """Widths of pin-labels, calculated for many labels at once rather than
+    walking each label's bounding-box.
+
+    :param body_x: x of each label's body
+    :type body_x: sequence
+    :param body_w: Width of each label's body
+    :type body_w: sequence
+    :param lo: Least x of each label's other children
+    :type lo: sequence
+    :param hi: Greatest x of each label's other children
+    :type hi: sequence
+    :param scale_x: Horizontal scale of the labels
+    :type scale_x: float
+    :return: Width of each label
+    :rtype: list of floats
+    """
+    return [
+        (float(max(x, x + w, h)) - float(min(x, x + w, l))) * abs(scale_x)
+        for x, w, l, h in zip(body_x, body_w, lo, hi)
+    ]
 
 
 class PinLabelGroup(Group):
@@ -157,8 +211,11 @@ class PinLabelGroup(Group):
         pin_coords = pitch_generator((0, 0), pin_pitch)
         label_coords = pitch_generator(label_start, label_pitch)
 
+        # Labels are created row by row, positioned all at once, then added
+        rows = []
         for row in labels:
             row_group = self.add(Group())
+            row_labels = []
             for label in row:
 
                 # If data is supplied convert to Label
@@ -182,17 +239,72 @@ class PinLabelGroup(Group):
                 label.add_tag(tag)
 
                 # Label follows another label in the row
-                try:
-                    prev_label = row_group.children[-1]
-                    label.x = prev_label.x + prev_label.width * scale.x
-                    label.y = prev_label.y + prev_label.body.y * scale.y
-                    label.leaderline = lline.Straight(direction="hh")
+                if row_labels:
+                    straight = lline.Straight(direction="hh")
+                    straight.add_tag(label.config["leaderline"]["tag"])
+                    # A new instance is unique, the leaderline setter's copy is not required
+                    label._leaderline = straight
                 # Start of a new row
-                except IndexError:
+                else:
                     label.x, label.y = next(pin_coords)
                     x, y = next(label_coords)
 
                     label.body.x += x - label.x * scale.x
                     label.body.y += y - label.y * scale.y
 
+                row_labels.append(label)
+            rows.append((row_group, row_labels))
+
+        self.place_rows(rows, scale)
+
+    @staticmethod
+    def place_rows(rows, scale):
+        """Place labels following the first label of each row end to end, then
+        add labels to their row group.
+
+        Widths of labels with an unrotated pinlabel.Body are calculated
+        together, other labels are measured by their bounding-box.
+
+        :param rows: Row groups paired with their labels
+        :type rows: list of tuples
+        :param scale: Scale of the labels
+        :type scale: Coords
+        """
+        labels = [label for _, row_labels in rows for label in row_labels]
+        simple = []
+        extents = []
+        for label in labels:
+            body = getattr(label, "body", None)
+            others = [
+                child.bounding_coords()
+                for child in getattr(label, "children", [])
+                if child is not body and hasattr(type(child), "bounding_coords")
+            ]
+            simple.append(
+                isinstance(label, Base)
+                and not label.rotate
+                and not label.clip
+                and type(body).bounding_coords is Body.bounding_coords
+                and any(child is body for child in label.children)
+            )
+            extents.append(
+                (
+                    body.x if simple[-1] else 0,
+                    body.width if simple[-1] else 0,
+                    min((c.x1 for c in others), default=math.inf),
+                    max((c.x2 for c in others), default=-math.inf),
+                )
+            )
+        widths = label_widths(*zip(*extents), scale.x) if labels else []
+
+        i = 0
+        for row_group, row_labels in rows:
+            prev_label = None
+            for label in row_labels:
+                if prev_label is not None:
+                    width = widths[i - 1] if simple[i - 1] else prev_label.width
+                    label.x = prev_label.x + width * scale.x
+                    label.y = prev_label.y + prev_label.body.y * scale.y
                 row_group.add(label)
+                prev_label = label
+                i += 1
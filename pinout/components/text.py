@@ -5,9 +5,11 @@ from pinout.components.layout import Group
 class TextBlock(Group):
     """Multiline text component."""
 
+    line_height = core.field("line_height")
+
     def __init__(self, content, line_height=None, **kwargs):
         # initialise module attrs
-        self._scale = core.Coords(*kwargs.pop("scale", (1, 1)))
+        self._text_scale = core.Coords(*kwargs.pop("scale", (1, 1)))
         self._content = None
         super().__init__(**kwargs)
         self.update_config(config.textblock)
@@ -25,14 +27,16 @@ class TextBlock(Group):
         if isinstance(content, str):
             content = [line.strip() for line in content.split("\n")]
         self._content = content
+        self.modified()
+
+    def build_key(self):
+        return (tuple(self.content), self.line_height, self._text_scale)
 
-    def render(self):
+    def build(self):
         self.add_tag(self.config["tag"])
         y = 0
         for text in self.content:
             self.add(
-                core.Text(content=text, x=0, y=y, scale=self._scale, **self.config)
+                core.Text(content=text, x=0, y=y, scale=self._text_scale, **self.config)
             )
-            y += self.line_height * self._scale.y
-
-        return super().render()
+            y += self.line_height * self._text_scale.y
@@ -1,71 +1,373 @@
-import base64
-import copy
-import math
+import io
+import itertools
+import operator
 import pathlib
-import PIL
-from PIL import Image as PILImage
 import re
-import urllib.request
-import uuid
+import types
+import urllib.parse
 import warnings
-import xml.etree.ElementTree as ET
-from collections import namedtuple
-from pinout import manager, templates
+import weakref
+from collections import ChainMap, namedtuple
+from pinout import config, image_tools, manager, svg_tools, templates
+from pinout.transform import Transform
 
 
 Coords = namedtuple("Coords", ("x y"))
 BoundingCoords = namedtuple("BoundingCoords", ("x1 y1 x2 y2"))
 BoundingRect = namedtuple("BoundingCoords", ("x y w h"))
+UNIT_SCALE = Coords(1, 1)
 
 
-class IdGenerator:
-    def __init__(self):
-        self.base = str(uuid.uuid4())
-        self.counter = 0
+class ConfigMap(ChainMap):
+    """Component config, layered over config dicts shared with other
+    components (eg. defaults in pinout.config).
 
-    def __call__(self):
-        self.counter += 1
-        return f"{self.base}_{self.counter}"
+    Nested dicts of shared layers are returned as read-only views. Editing
+    them in place raises a TypeError, assign the key to replace them with a
+    dict of the component's own instead.
+    """
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, dict) and key not in self.maps[0]:
+            return types.MappingProxyType(value)
+        return value
 
 
-diagram_id = IdGenerator()
+class IdScope:
+    """Issue short ids, unique within the scope. Each Diagram has a scope of
+    its own so ids are deterministic and independent of other diagrams.
+
+    :param prefix: Prepended to each id, defaults to "p"
+    :type prefix: str, optional
+    """
+
+    def __init__(self, prefix="p"):
+        self.prefix = prefix
+        self.counter = itertools.count(1)
+
+    def __call__(self):
+        return f"{self.prefix}{next(self.counter)}"
+
+
+# Ids of components referenced outside a diagram (eg. rendered individually)
+component_id = IdScope("c")
+
+# Output settings (see config.output) and templates components have cached
+# markup with, each combination is held once
+output_keys = {}
+
+# Build state of components without a build() of their own
+NOTHING_BUILT = ((), ())
+
+# Attributes set by TransformMixin. They are declared as slots by the classes
+# combining the mixin with Component, two bases cannot both declare slots.
+TRANSFORM_ATTRS = (
+    "_x",
+    "_y",
+    "_matrix",
+    "_translate",
+    "_scale",
+    "_rotate",
+    "_skewx",
+    "_skewy",
+)
+
+
+def field(name, geometry=False):
+    """Property of a component attribute held in the slot '_' + name.
+
+    Assigning the attribute discards the component's cached markup and marks
+    it to be materialised again (see Component.modified). Assigning a
+    geometry attribute also discards cached transforms and bounding coords
+    (see Component.invalidate). Constructors assign the slot directly.
+
+    :param name: Attribute name
+    :type name: str
+    :param geometry: The attribute alters the component's bounding-box, defaults to False
+    :type geometry: bool, optional
+    :return: Property
+    :rtype: property
+    """
+    slot = "_" + name
+    if geometry:
+
+        def setter(self, value):
+            setattr(self, slot, value)
+            self._transform = None
+            self._world = None
+            self.invalidate()
+
+    else:
+
+        def setter(self, value):
+            setattr(self, slot, value)
+            self.modified()
+
+    # attrgetter keeps reads as quick as a plain slot
+    return property(operator.attrgetter(slot), setter)
+
+
+def common_attrs(params):
+    """Attributes shared by all components. Built-in equivalent of the
+    'component_common.svg' template.
+
+    :param params: Component instance
+    :return: SVG attributes, each preceded by a space
+    :rtype: string
+    """
+    fmt = svg_tools.formatter()
+    attrs = f' class="{params.tag}"' if params.tag else ""
+    if params.clip:
+        attrs += f' clip-path="url(#{params.clip.id})"'
+    if config.output["compact"]:
+        transform = params.compact_transform()
+        if transform:
+            attrs += f' transform="{transform}"'
+        if params.referenced:
+            attrs += f' id="{params.id}"'
+        return attrs
+    attrs += (
+        f' transform="translate({fmt(params.x)} {fmt(params.y)}) '
+        f"scale({fmt(params.scale.x)} {fmt(params.scale.y)}) "
+        f"rotate({fmt(params.rotate)})"
+        f'{params.transform_functions()}"'
+    )
+    if params.referenced:
+        attrs += f' id="{params.id}"'
+    return (
+        f'{attrs} clipPathUnits="userSpaceOnUse" shape-rendering="geometricPrecision"'
+    )
+
+
+def iter_markup(obj):
+    """Generate SVG markup of any renderable object in chunks.
+
+    Objects that override *render* (eg. user customised components) are
+    rendered in a single chunk so their override is respected.
+
+    :param obj: Object with a *render* method
+    :return: SVG markup
+    :rtype: generator of strings
+    """
+    if not isinstance(obj, Component):
+        return iter((obj.render(),))
+    obj.materialise(recursive=False)
+    if type(obj).render is Component.render:
+        return obj.iter_render()
+    return iter((obj.render(),))
 
 
 class TransformMixin:
+    __slots__ = ()
+
+    x = field("x", geometry=True)
+    y = field("y", geometry=True)
+    matrix = field("matrix", geometry=True)
+    translate = field("translate", geometry=True)
+    scale = field("scale", geometry=True)
+    rotate = field("rotate", geometry=True)
+    skewx = field("skewx", geometry=True)
+    skewy = field("skewy", geometry=True)
+
     def __init__(
         self,
         matrix=None,
         translate=None,
-        scale=(1, 1),
+        scale=UNIT_SCALE,
         rotate=0,
         skewx=None,
         skewy=None,
         **kwargs,
     ):
         # kwargs that make it to here are ignored.
-        self.matrix = matrix
-        self.translate = translate
-        self.scale = Coords(*scale)
-        self.rotate = rotate
-        self.skewx = skewx
-        self.skewy = skewy
+        self._matrix = Transform(*matrix) if matrix else None
+        self._translate = Coords(*translate) if translate else None
+        # Coords are immutable, they are shared rather than copied
+        self._scale = scale if type(scale) is Coords else Coords(*scale)
+        self._rotate = rotate
+        self._skewx = skewx
+        self._skewy = skewy
 
         super().__init__()
 
+    def extra_transform(self):
+        """'matrix', 'translate', 'skewx' and 'skewy' combined as a single
+        transform. These are applied before 'scale' and 'rotate'.
+
+        :return: Combined transform, or None if none are set
+        :rtype: Transform
+        """
+        transforms = []
+        if self.matrix:
+            transforms.append(self.matrix)
+        if self.translate:
+            transforms.append(Transform.translation(*self.translate))
+        if self.skewx:
+            transforms.append(Transform.skew(x=self.skewx))
+        if self.skewy:
+            transforms.append(Transform.skew(y=self.skewy))
+        if not transforms:
+            return None
+        transform = transforms[0]
+        for t in transforms[1:]:
+            transform = transform @ t
+        return transform
+
+    def transform_functions(self):
+        """SVG transform functions of 'matrix', 'translate', 'skewx' and
+        'skewy', appended to a component's transform attribute.
+
+        :return: Transform functions, each preceded by a space
+        :rtype: string
+        """
+        fmt = svg_tools.formatter()
+        functions = ""
+        if self.matrix:
+            functions += f" matrix({' '.join(map(fmt, self.matrix))})"
+        if self.translate:
+            functions += f" translate({fmt(self.translate.x)} {fmt(self.translate.y)})"
+        if self.skewx:
+            functions += f" skewX({fmt(self.skewx)})"
+        if self.skewy:
+            functions += f" skewY({fmt(self.skewy)})"
+        return functions
+
+    def compact_transform(self):
+        """Transform attribute value omitting functions with no effect.
+
+        :return: SVG transform functions, empty if the transform is identity
+        :rtype: string
+        """
+        fmt = svg_tools.formatter()
+        functions = ""
+        if self.x or self.y:
+            functions += f" translate({fmt(self.x)} {fmt(self.y)})"
+        if self.scale != (1, 1):
+            functions += f" scale({fmt(self.scale.x)} {fmt(self.scale.y)})"
+        if self.rotate:
+            functions += f" rotate({fmt(self.rotate)})"
+        return (functions + self.transform_functions()).lstrip()
+
 
 class Component:
     """common functions and attributes shared by all components"""
 
+    # Attributes set on every instance are slots. Other attributes (eg. those
+    # of subclasses without __slots__) are kept in a __dict__, created when
+    # first needed.
+    __slots__ = (
+        "_clip",
+        "config",
+        "defs",
+        "_tag",
+        # Id of the component's element, assigned once it is referenced
+        "_id",
+        # Weak reference to the Layout this component has been added to
+        "_parent",
+        # Cached bounding coords, discarded by invalidate()
+        "_bbox",
+        # Cached transforms, discarded when geometry attributes change
+        "_transform",
+        "_world",
+        # Cached markup of the component, excluding its children, and the
+        # output settings (see config.output) it was rendered with
+        "_markup",
+        "_output",
+        # Build key and components generated by build(), None if not built
+        "_build",
+        # The component and its descendants are built, see materialise()
+        "_materialised",
+        "__dict__",
+        "__weakref__",
+    )
+
+    # Primitive components (Rect, Text, Path, Circle, Use) serialize markup
+    # directly. Set to a template name, or jinja2.Template, to render the
+    # component with Jinja instead.
+    template = None
+
+    tag = field("tag")
+
+    def __new__(cls, *args, **kwargs):
+        # Bookkeeping slots are read by property setters, assign them before
+        # any __init__ sets attributes.
+        self = super().__new__(cls)
+        self._parent = None
+        self._bbox = None
+        self._transform = None
+        self._world = None
+        self._id = None
+        self._markup = None
+        self._output = None
+        self._build = None
+        self._materialised = False
+        return self
+
     def __init__(self, clip=None, config=None, defs=None, tag=None, **kwargs):
         self._clip = None
-        self.config = config or {}
-        self.defs = defs or []
-        self.id = diagram_id()
-        self.tag = tag
+        # Config supplied by the caller is shared, values assigned to the
+        # component's config are written to its own layer.
+        self.config = ConfigMap({}, config) if config else {}
+        # Components without defs share an empty tuple, see add_def
+        self.defs = defs or ()
+        self._tag = tag
         super().__init__(**kwargs)
 
         self.clip = clip
 
+    @property
+    def id(self):
+        """Id of the component's element. Components referenced by others
+        (eg. clip-paths and <use> targets) are given ids from their diagram's
+        scope when it is rendered. Otherwise an id is assigned when first
+        requested.
+
+        :rtype: str
+        """
+        if self._id is None:
+            self.id = component_id()
+        return self._id
+
+    @id.setter
+    def id(self, value):
+        self._id = value
+        self._markup = None
+
+    @property
+    def referenced(self):
+        """The component has an id, only referenced components render one.
+
+        :rtype: bool
+        """
+        return self._id is not None
+
+    def cached_markup(self):
+        """Markup cached by the component. It is discarded if the output
+        settings (see config.output), or the component's template, have
+        changed since it was rendered.
+
+        :return: Cached markup, or None
+        """
+        output = (self.template, tuple(config.output.items()))
+        # Components rendered with the same settings share a single key
+        output = output_keys.setdefault(output, output)
+        if self._output is not output:
+            self._output = output
+            self._markup = None
+        return self._markup
+
+    def references(self):
+        """Components referenced, by id, in the component's markup.
+
+        Diagrams assign ids to these before rendering. Override in
+        components that reference others.
+
+        :return: Referenced components
+        :rtype: tuple
+        """
+        return (self.clip,) if self.clip else ()
+
     @property
     def clip(self):
         return self._clip
@@ -77,10 +379,111 @@ class Component:
                 self._clip = obj
             else:
                 self._clip = ClipPath(children=obj)
+            # A clip-path can be shared; each user is notified of changes to it
+            self._clip._users.add(self)
+            self.invalidate()
+
+    @property
+    def parent(self):
+        """Layout instance the component has been added to (or None)."""
+        return self._parent() if self._parent else None
+
+    def modified(self):
+        """Discard cached markup of the component, and mark it and its
+        ancestors to be materialised before the next render. Ancestors are
+        walked until one is already marked.
+
+        Called automatically when attributes exposed as properties change.
+        Call it manually after mutating component data directly (eg. editing
+        a *content* list in place).
+        """
+        self._markup = None
+        component = self
+        while component is not None and component._materialised:
+            component._materialised = False
+            component = component.parent
+
+    def invalidate(self):
+        """Discard cached bounding coords and markup of the component, and
+        cached bounding coords of its ancestors, which are also marked to be
+        materialised before the next render. Ancestors are walked until one
+        has neither cached bounding coords nor been materialised, its own
+        ancestors are already the same.
+
+        Called automatically when geometry attributes change or children are
+        added. Call it manually after mutating component data directly (eg.
+        editing a *children* list in place).
+        """
+        self._bbox = None
+        self._markup = None
+        self._materialised = False
+        parent = self.parent
+        if parent is not None and (parent._bbox is not None or parent._materialised):
+            parent.invalidate()
+
+    def build(self):
+        """Add components generated from instance data (eg. the text of a
+        label). Override in components that generate children, along with
+        *build_key*.
+
+        Called once before the component is first rendered and again, if
+        its build key changes, before the next render.
+        """
+
+    def build_key(self):
+        """Values read by *build*. Generated components are removed and
+        rebuilt when the key changes. Override in components that generate
+        children, the default key is empty and components are never rebuilt.
+
+        :return: Comparable value, eg. a tuple
+        """
+        return ()
+
+    def materialise(self, recursive=True):
+        """Build generated components, rebuilding those whose build key has
+        changed since they were built. Built components are otherwise left
+        unchanged so repeated calls (and renders) do not duplicate content.
+
+        Descendants are skipped unless they, or their own descendants, have
+        been modified since they were materialised.
+
+        :param recursive: Also materialise descendants, defaults to True
+        :type recursive: bool, optional
+        """
+        if self._materialised:
+            return
+        build = self._build
+        if build is not None and build[0] != self.build_key():
+            self.unbuild()
+            build = None
+        if build is None:
+            if type(self).build is Component.build:
+                self._build = NOTHING_BUILT
+            else:
+                key = self.build_key()
+                children = getattr(self, "children", [])
+                existing = set(map(id, children))
+                self.build()
+                generated = tuple(c for c in children if id(c) not in existing)
+                self._build = (key, generated)
+        if recursive:
+            for child in getattr(self, "children", ()):
+                if isinstance(child, Component) and not child._materialised:
+                    child.materialise()
+            self._materialised = True
+
+    def unbuild(self):
+        """Remove generated components. They are rebuilt on next render."""
+        build, self._build = self._build, None
+        for instance in build[1] if build else ():
+            self.remove(instance)
+        self.modified()
 
     def add_def(self, instance):
         """Add a component to the svg 'def' section"""
         if instance:
+            if not isinstance(self.defs, list):
+                self.defs = []
             self.defs.append(instance)
         return instance
 
@@ -96,12 +499,55 @@ class Component:
         self.tag = " ".join(tag_list)
 
     def update_config(self, vals):
-        """update config dict
+        """Layer config values over the component's existing config.
+
+        Values are not copied, config dicts (eg. defaults in pinout.config)
+        are shared by every component they are applied to. Assigning a key
+        of the component's config writes to a layer of its own, leaving
+        shared dicts unchanged. Nested dicts of shared layers are read-only
+        (see :class:`ConfigMap`), replace them rather than update them in
+        place.
 
         :param vals: Values to update
         :type vals: dict
         """
-        self.config.update(copy.deepcopy(vals))
+        maps = getattr(self.config, "maps", [self.config])
+        self.config = ConfigMap({}, vals, *[m for m in maps if m])
+
+    def render(self):
+        """Render SVG markup.
+
+        :return: SVG markup
+        :rtype: string
+        """
+        self.materialise(recursive=False)
+        return "".join(self.iter_render())
+
+    def iter_render(self):
+        """Generate SVG markup in chunks.
+
+        :return: SVG markup
+        :rtype: generator of strings
+        """
+        return iter(())
+
+    def write(self, fp, minify=False):
+        """Write SVG markup to a file object chunk by chunk.
+
+        Markup is never assembled into a single string so output can be
+        streamed into any writable object (eg. gzip.open(path, "wt")).
+
+        :param fp: Writable object. Text streams are written strings, other objects are written utf-8 encoded bytes.
+        :type fp: file object
+        :param minify: Collapse whitespace and round numbers (see svg_tools.minify), defaults to False
+        :type minify: bool, optional
+        """
+        encode = not isinstance(fp, io.TextIOBase)
+        chunks = iter_markup(self)
+        if minify:
+            chunks = svg_tools.minify(chunks)
+        for chunk in chunks:
+            fp.write(chunk.encode("utf-8") if encode else chunk)
 
     def render_defs(self):
         """Render SVG markup from 'defs'
@@ -109,15 +555,22 @@ class Component:
         :return: SVG markup
         :rtype: string
         """
-        content = ""
+        return "".join(self.iter_defs())
+
+    def iter_defs(self):
+        """Generate SVG markup from 'defs' in chunks.
 
+        :return: SVG markup
+        :rtype: generator of strings
+        """
         # Transfer clippath to defs
-        self.add_def(self.clip)
+        if self.clip not in self.defs:
+            self.add_def(self.clip)
 
         # Render defs
         for d in self.defs:
             try:
-                content += d.render()
+                yield from iter_markup(d)
             except AttributeError as e:
                 print("*", d)
                 print(d.render)
@@ -125,57 +578,203 @@ class Component:
                 print(e)
 
         # Recursively render children defs
-        try:
-            for child in [
-                child for child in self.children if hasattr(child, "render_defs")
-            ]:
-                content += child.render_defs()
-        except AttributeError:
-            pass
-            # Object has no children
+        for child in getattr(self, "children", []):
+            if hasattr(child, "iter_defs"):
+                yield from child.iter_defs()
 
-        return content
+    @property
+    def transform(self):
+        """Position and rotation of the component as an affine transform.
+        Cached until the component's geometry changes.
 
-    @staticmethod
-    def rotate_box_coords(origin, coords, rotate):
-        ox, oy = origin
+        :rtype: Transform
+        """
+        if self._transform is None:
+            self._transform = Transform.translation(
+                self.x, self.y
+            ) @ Transform.rotation(self.rotate)
+        return self._transform
+
+    @property
+    def world_transform(self):
+        """Transform from the component's coordinate space to that of the
+        root component (usually a Diagram), as rendered.
+
+        Composed from the world transform of the component's parent, each
+        level is calculated once and cached until the component or one of
+        its ancestors moves.
+
+        :rtype: Transform
+        """
+        parent = self.parent
+        base = parent.world_transform if parent is not None else None
+        if self._world is None or self._world[0] is not base:
+            local = self.local_transform()
+            self._world = (base, local if base is None else base @ local)
+        return self._world[1]
+
+    def local_transform(self):
+        """Transform from the component's coordinate space to that of its
+        parent, as rendered: translate, scale, rotate, then 'matrix',
+        'translate', 'skewx' and 'skewy'.
+
+        :rtype: Transform
+        """
+        local = (
+            Transform.translation(self.x, self.y)
+            @ Transform.scaling(*self.scale)
+            @ Transform.rotation(self.rotate)
+        )
+        extra = self.extra_transform()
+        return local @ extra if extra else local
+
+    def world_bounding_coords(self):
+        """Coordinates of the component's bounding rectangle in the
+        coordinate space of the root component.
+
+        :return: (x1, y1, x2, y2)
+        :rtype: BoundingCoords (namedtuple)
+        """
+        coords = self.bounding_coords()
+        parent = self.parent
+        if parent is None:
+            return coords
+        return BoundingCoords(*parent.world_transform.bounds(coords))
+
+    def rotate_box(self, coords):
+        """Bounds of a box rotated around the component's origin.
+
+        :param coords: (x1, y1, x2, y2)
+        :type coords: tuple
+        :rtype: BoundingCoords (namedtuple)
+        """
         x1, y1, x2, y2 = coords
-        # rotate corners of bounding box
-        corners = [(x1, y1), (x2, y1), (x1, y2), (x2, y2)]
-        rx = []
-        ry = []
-        for (x, y) in corners:
-            rx.append(
-                ox
-                + (x - ox) * math.cos(math.radians(rotate))
-                - (y - oy) * math.sin(math.radians(rotate))
-            )
-            ry.append(
-                oy
-                + (x - ox) * math.sin(math.radians(rotate))
-                + (y - oy) * math.cos(math.radians(rotate))
-            )
+        return BoundingCoords(
+            *self.transform.bounds((x1 - self.x, y1 - self.y, x2 - self.x, y2 - self.y))
+        )
 
-        return BoundingCoords(min(rx), min(ry), max(rx), max(ry))
+    @staticmethod
+    def rotate_box_coords(origin, coords, rotate):
+        return BoundingCoords(*Transform.rotation(rotate, origin).bounds(coords))
 
 
 class Layout(Component, TransformMixin):
     """Base class fundamentally grouping other components together."""
 
+    __slots__ = ("_children", "_index") + TRANSFORM_ATTRS
+
     def __init__(self, x=0, y=0, children=None, **kwargs):
-        self.x = x
-        self.y = y
+        # Index of descendants {class: {instance: None}}. Only maintained
+        # by the top-level component of a tree.
+        self._index = None
+        self._x = x
+        self._y = y
+        self._children = []
         self.children = children or []
 
         super().__init__(**kwargs)
 
+    @property
+    def children(self):
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        # Replacing children re-indexes the tree
+        for child in self._children:
+            self._unindex(child)
+        self._children = children
+        self.invalidate()
+        for child in children:
+            self._adopt(child)
+
+    def _adopt(self, instance):
+        """Record self as the parent of 'instance' and index it."""
+        if isinstance(instance, Component):
+            instance._parent = weakref.ref(self)
+            instance.invalidate()
+        else:
+            self.invalidate()
+
+        # Index instance (and any descendants it has indexed) in the top-level component
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        if root._index is None:
+            root._index = {}
+        root._index.setdefault(type(instance), {})[instance] = None
+        sub_index = getattr(instance, "_index", None)
+        if sub_index:
+            for cls, instances in sub_index.items():
+                root._index.setdefault(cls, {}).update(instances)
+            instance._index = None
+
     def add(self, instance):
         self.children.append(instance)
+        self._adopt(instance)
+        return instance
+
+    def insert(self, index, instance):
+        """Insert an object into Layout.children before 'index'.
+
+        :param index: Position in children list
+        :type index: int
+        :param instance: Component class instance
+        :return: instance
+        """
+        self.children.insert(index, instance)
+        self._adopt(instance)
         return instance
 
+    def remove(self, instance):
+        """Remove an object from Layout.children.
+
+        :param instance: Component class instance
+        :return: instance
+        """
+        self.children.remove(instance)
+        self._unindex(instance)
+        self.invalidate()
+        return instance
+
+    def _unindex(self, instance):
+        """Remove 'instance' and its descendants from the top-level index."""
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        if root._index:
+            stack = [instance]
+            while stack:
+                c = stack.pop()
+                root._index.get(type(c), {}).pop(c, None)
+                stack.extend(getattr(c, "children", []))
+
+        if isinstance(instance, Component):
+            instance._parent = None
+
+    def iter_template(self, template_name, streams, **context):
+        """Render a template in chunks, caching its static markup.
+
+        :param template_name: Name of the template
+        :type template_name: str
+        :param streams: Template variable names mapped to generators of strings
+        :type streams: dict
+        :return: SVG markup
+        :rtype: generator of strings
+        """
+        if self.cached_markup() is None:
+            self._markup = templates.fragments(
+                self.template or template_name, streams, **context
+            )
+        for i, part in enumerate(self._markup):
+            if i % 2:
+                yield from streams[part]
+            elif part:
+                yield part
+
     @staticmethod
     def find_children_by_type(component, target_type):
-        """Recursively find all children of the component and it's decendents by type.
+        """Find all children of the component and it's decendents by type.
 
         :param component: Component instance to start seach from
         :type component: class instance
@@ -184,16 +783,39 @@ class Layout(Component, TransformMixin):
         :return: All instances of type 'target_type' that are descendents of 'component'
         :rtype: list
         """
-        results = []
-        try:
-            for c in component.children:
-                if isinstance(c, target_type):
-                    results.append(c)
-                results += Layout.find_children_by_type(c, target_type)
-        except AttributeError:
-            pass
-            # No children
+        return Layout.find_children_by_types(component, target_type)[target_type]
+
+    @staticmethod
+    def find_children_by_types(component, *target_types):
+        """Find all children of the component and it's decendents for several types at once.
 
+        A top-level component (eg. a Diagram) answers from its index without
+        traversing the component tree. Other components are traversed once,
+        regardless of how many types are requested.
+
+        :param component: Component instance to start seach from
+        :type component: class instance
+        :param target_types: classes to match with instances
+        :type target_types: class
+        :return: Instances of each type that are descendents of 'component'
+        :rtype: dict {target_type: list}
+        """
+        results = {target_type: [] for target_type in target_types}
+        index = getattr(component, "_index", None)
+        if index is not None and component.parent is None:
+            for cls, instances in index.items():
+                for target_type in target_types:
+                    if issubclass(cls, target_type):
+                        results[target_type].extend(instances)
+            return results
+
+        stack = list(reversed(getattr(component, "children", [])))
+        while stack:
+            c = stack.pop()
+            for target_type in target_types:
+                if isinstance(c, target_type):
+                    results[target_type].append(c)
+            stack.extend(reversed(getattr(c, "children", [])))
         return results
 
     def bounding_rect(self):
@@ -208,55 +830,33 @@ class Layout(Component, TransformMixin):
     def bounding_coords(self):
         """Coordinates of the components's bounding rectangle.
 
+        The result is cached until the component, or one of its descendants,
+        is altered.
+
         :return: (x1, y1, x2, y2)
         :rtype: BoundingCoords (namedtuple)
         """
-        # Collect bounding coords of children
-        x = []
-        y = []
+        if self._bbox is None:
+            self._bbox = self._bounding_coords()
+        return self._bbox
+
+    def _bounding_coords(self):
+        # Collect bounding coords of children, in the parent's coordinate space
         if self.clip:
             targets = self.clip.children
         else:
             targets = self.children
-        for child in [
-            instance
+        transform = self.local_transform()
+        bounds = [
+            transform.bounds(instance.bounding_coords())
             for instance in targets
             if hasattr(type(instance), "bounding_coords")
-        ]:
-            coords = child.bounding_coords()
-            x.append(self.x + coords.x1 * self.scale.x)
-            y.append(self.y + coords.y1 * self.scale.y)
-            x.append(self.x + coords.x2 * self.scale.x)
-            y.append(self.y + coords.y2 * self.scale.y)
-
-        try:
-            x1, y1, x2, y2 = min(x), min(y), max(x), max(y)
-
-            # Clip object has its own rotation
-            if self.clip:
-                return BoundingCoords(x1, y1, x2, y2)
-
-            # rotate corners of bounding box
-            corners = [(x1, y1), (x2, y1), (x1, y2), (x2, y2)]
-            rx = []
-            ry = []
-            for (x, y) in corners:
-                rx.append(
-                    self.x
-                    + (x - self.x) * math.cos(math.radians(self.rotate))
-                    - (y - self.y) * math.sin(math.radians(self.rotate))
-                )
-                ry.append(
-                    self.y
-                    + (x - self.x) * math.sin(math.radians(self.rotate))
-                    + (y - self.y) * math.cos(math.radians(self.rotate))
-                )
-
-            return BoundingCoords(min(rx), min(ry), max(rx), max(ry))
-
-        except ValueError:
+        ]
+        if not bounds:
             # There are no children
             return BoundingCoords(0, 0, 0, 0)
+        x1, y1, x2, y2 = zip(*bounds)
+        return BoundingCoords(min(x1), min(y1), max(x2), max(y2))
 
     def render_children(self):
         """Render SVG markup from 'children'
@@ -264,34 +864,59 @@ class Layout(Component, TransformMixin):
         :return: SVG markup
         :rtype: string
         """
-        content = ""
+        return "".join(self.iter_children())
+
+    def iter_children(self):
+        """Generate SVG markup from 'children' in chunks.
+
+        :return: SVG markup
+        :rtype: generator of strings
+        """
         for child in self.children:
             try:
-                content += child.render()
+                yield from iter_markup(child)
             except TypeError as e:
                 print(f"An error occurred rendering: {child}")
                 print(child.render())
                 print(e)
-        return content
 
 
 class Use(Layout):
     """Implement <use> svg tag"""
 
+    __slots__ = ("_target",)
+
+    target = field("target")
+
     def __init__(self, instance, **kwargs):
-        self.target_id = instance.id
+        self._target = instance
 
         super().__init__(**kwargs)
 
-    def render(self):
-        # convert kwargs into parameters for <use>
-        tplt = templates.get("use.svg")
-        return tplt.render(use=self)
+    @property
+    def target_id(self):
+        return self.target.id
+
+    def references(self):
+        return (self.target,) + super().references()
+
+    def iter_render(self):
+        if self.cached_markup() is None:
+            if self.template:
+                self._markup = templates.get(self.template).render(use=self)
+            else:
+                self._markup = (
+                    f"<use{common_attrs(self)} "
+                    f'xlink:href="#{self.target_id}" href="#{self.target_id}"/>\n'
+                )
+        yield self._markup
 
 
 class Group(Layout):
     """Group components together"""
 
+    __slots__ = ()
+
     def __init__(self, x=0, y=0, tag=None, **kwargs):
         super().__init__(x=x, y=y, tag=tag, **kwargs)
 
@@ -303,20 +928,23 @@ class Group(Layout):
     def height(self):
         return self.bounding_rect().h
 
-    def render(self):
+    def iter_render(self):
         """Render children into a <group> tag.
 
         :return: SVG markup
-        :rtype: string
+        :rtype: generator of strings
         """
-        tplt = templates.get("group.svg")
-        return tplt.render(group=self)
+        yield from self.iter_template(
+            "group.svg", {"children": self.iter_children()}, group=self
+        )
 
 
 class ClipPath(Group):
     """Define a clip-path component"""
 
     def __init__(self, children=None, **kwargs):
+        # Components using this clip-path
+        self._users = weakref.WeakSet()
         super().__init__(**kwargs)
         # Accept 'children' as list or single instance.
         children = children or []
@@ -327,10 +955,16 @@ class ClipPath(Group):
             # Children is a single component (not an iterible)
             self.add(children)
 
-    def render(self):
+    def invalidate(self):
+        super().invalidate()
+        for user in list(getattr(self, "_users", ())):
+            user.invalidate()
+
+    def iter_render(self):
         """Render children into a <clipPath> tag."""
-        tplt = templates.get("clippath.svg")
-        return tplt.render(path=self)
+        yield from self.iter_template(
+            "clippath.svg", {"children": self.iter_children()}, path=self
+        )
 
 
 class StyleSheet:
@@ -371,9 +1005,11 @@ class Raw:
 class SvgShape(Component, TransformMixin):
     """Base class for components that have a graphical representation."""
 
+    __slots__ = ("_width", "_height") + TRANSFORM_ATTRS
+
     def __init__(self, x=0, y=0, width=0, height=0, **kwargs):
-        self.x = x
-        self.y = y
+        self._x = x
+        self._y = y
         self._width = width
         self._height = height
 
@@ -388,6 +1024,7 @@ class SvgShape(Component, TransformMixin):
     @width.setter
     def width(self, val):
         self._width = val
+        self.invalidate()
 
     @property
     def height(self):
@@ -398,6 +1035,7 @@ class SvgShape(Component, TransformMixin):
     @height.setter
     def height(self, val):
         self._height = val
+        self.invalidate()
 
     def bounding_rect(self):
         """Component's origin coordinates and dimensions"""
@@ -406,129 +1044,186 @@ class SvgShape(Component, TransformMixin):
 
     def bounding_coords(self):
         """Coordinates representing a shape's bounding-box."""
+        if self._bbox is None:
+            self._bbox = self._bounding_coords()
+        return self._bbox
+
+    def _bounding_coords(self):
         if self.clip:
             return self.clip.bounding_coords()
-        else:
-            x = [self.x * self.scale.x, (self.x + self.width) * self.scale.x]
-            y = [self.y * self.scale.y, (self.y + self.height) * self.scale.y]
+        return BoundingCoords(
+            *self.local_transform().bounds((0, 0, self.width, self.height))
+        )
 
-            return Component.rotate_box_coords(
-                origin=(self.x, self.y),
-                coords=(min(x), min(y), max(x), max(y)),
-                rotate=self.rotate,
-            )
+    def iter_render(self):
+        """Render SVG markup. Shapes serialize quickly, their markup is not
+        cached so it is not held for every shape of a large diagram.
 
-    def render(self):
+        :return: SVG markup
+        :rtype: generator of strings
+        """
+        markup = self.serialize()
+        if markup:
+            yield markup
+
+    def serialize(self):
+        """SVG markup of the shape.
+
+        :return: SVG markup
+        :rtype: string
+        """
         return ""
 
 
 class Path(SvgShape):
     """SVG Path object"""
 
+    __slots__ = ("_d",)
+
+    d = field("d")
+
     def __init__(self, path_definition="", **kwargs):
         super().__init__(**kwargs)
-        self.d = path_definition
+        self._d = path_definition
 
-    def render(self):
+    def serialize(self):
         """Render a <path> tag.
 
         :return: SVG markup
         :rtype: string
         """
-        tplt = templates.get("path.svg")
-        return tplt.render(path=self)
+        if self.template:
+            return templates.get(self.template).render(path=self)
+        return f'<path{common_attrs(self)} d="{self.d}"/>\n'
 
 
 class Rect(SvgShape):
     """SVG <rect> object"""
 
+    __slots__ = ("_corner_radius",)
+
+    corner_radius = field("corner_radius")
+
     def __init__(self, *args, corner_radius=0, **kwargs):
-        self.corner_radius = corner_radius
+        self._corner_radius = corner_radius
         super().__init__(*args, **kwargs)
 
-    def render(self):
+    def serialize(self):
         """Render a <rect> tag.
 
         :return: SVG markup
         :rtype: string
         """
-        tplt = templates.get("rect.svg")
-        return tplt.render(rect=self)
+        if self.template:
+            return templates.get(self.template).render(rect=self)
+        fmt = svg_tools.formatter()
+        attrs = (
+            f'{common_attrs(self)} width="{fmt(self.width)}" '
+            f'height="{fmt(self.height)}"'
+        )
+        if self.corner_radius:
+            radius = fmt(self.corner_radius)
+            attrs += f' rx="{radius}" ry="{radius}"'
+        return f"<rect{attrs}/>\n"
 
 
 class Circle(SvgShape):
     """SVG <circle> object"""
 
+    __slots__ = ("_r",)
+
+    r = field("r")
+
     def __init__(self, cx, cy, r, **kwargs):
-        self.r = r
+        self._r = r
         kwargs["x"] = cx
         kwargs["y"] = cy
         super().__init__(**kwargs)
 
-    def render(self):
+    def serialize(self):
         """Render a <circle> tag."""
 
-        tplt = templates.get("circle.svg")
-        return tplt.render(circle=self)
+        if self.template:
+            return templates.get(self.template).render(circle=self)
+        r = svg_tools.formatter()(self.r)
+        return f'<circle{common_attrs(self)} cx="0" cy="0" r="{r}"/>\n'
 
 
 class Text(SvgShape):
     """SVG <text> object"""
 
+    __slots__ = ("_content",)
+
+    content = field("content")
+
     def __init__(self, content, **kwargs):
         super().__init__(**kwargs)
-        self.content = content
+        self._content = content
 
-    def render(self):
+    def serialize(self):
         """Render a <text> tag.
 
         :return: SVG markup
         :rtype: string
         """
-        tplt = templates.get("text.svg")
-        return tplt.render(text=self)
+        if self.template:
+            return templates.get(self.template).render(text=self)
+        return f"<text{common_attrs(self)}>{self.content}</text>\n"
 
 
 class Image(SvgShape):
     """Include an image in the diagram."""
 
+    embed = field("embed")
+
+    # Local path of the image file, relative paths are resolved at construction
+    _im_path = None
+    # URL of a remote image file
+    _url = None
+
     def __init__(self, src, dpi=72, embed=False, **kwargs):
         self.coords = kwargs.pop("coords", {})
         self._dpi = dpi
-        self.embed = embed
-        self.im_size = (1, 1)
+        self._embed = embed
+        self._im_size = None
         self.src = src
-        self.svg_data = None
 
-        try:
-            # Load image dimensions to avoid multiple loads when calculating coords
-            # Allow relative paths outside CWD
-            cwd = pathlib.Path.cwd()
-            im = PILImage.open(cwd.joinpath(self.src))
-            self.im_size = im.size
-        except TypeError as e:
-            # Image src is assumed to be another Image instance
-            self.im_size = self.src.im_size
+        if isinstance(self.src, Image):
             self.coords = self.src.coords
+        elif self.url is None:
+            # Allow relative paths outside CWD
+            self._im_path = pathlib.Path.cwd().joinpath(self.src)
 
-        except PIL.UnidentifiedImageError:
-            # Image is assumed to be SVG
-            self.set_svg_im_size()
-
-        except OSError:
-            try:
-                # file not at local path, try path as URL
-                im = PILImage.open(urllib.request.urlopen(self.src))
-                self.im_size = im.size
-            except (PIL.UnidentifiedImageError):
-                # Image is assumed to be SVG
-                # Match arbitary im_size to width and height so no scaling occurs
-                pass
-
-        kwargs["width"] = kwargs.get("width", self.im_size[0])
-        kwargs["height"] = kwargs.get("height", self.im_size[1])
+        # Image dimensions are only read if required
+        if "width" not in kwargs or "height" not in kwargs:
+            kwargs["width"] = kwargs.get("width", self.im_size[0])
+            kwargs["height"] = kwargs.get("height", self.im_size[1])
         super().__init__(**kwargs)
 
+    @property
+    def im_size(self):
+        """Dimensions of the image file, read when first required."""
+        if self._im_size is None:
+            self._im_size = self.probe_im_size()
+        return self._im_size
+
+    @im_size.setter
+    def im_size(self, val):
+        self._im_size = val
+
+    def probe_im_size(self):
+        """Read image dimensions from the image header.
+
+        :return: Width and height of the image
+        :rtype: tuple
+        """
+        if isinstance(self.src, Image):
+            return self.src.im_size
+        info = self.image_info()
+        if info["format"] == "SVG":
+            return self.svg_im_size(info["attrib"])
+        return tuple(info["size"])
+
     @property
     def dpi(self):
         return self._dpi
@@ -536,7 +1231,9 @@ class Image(SvgShape):
     @dpi.setter
     def dpi(self, val):
         self._dpi = val
-        self.set_svg_im_size()
+        # SVG dimensions depend on dpi
+        self._im_size = None
+        self.modified()
 
     @property
     def src(self):
@@ -548,19 +1245,55 @@ class Image(SvgShape):
         if isinstance(val, Image):
             self._src = val
         else:
+            # pathlib.Path does not preserve URLs, keep them separately
+            self._url = str(val) if image_tools.is_url(val) else None
             self._src = pathlib.Path(val)
+        self.modified()
+
+    @property
+    def url(self):
+        """URL of a remote image file, None if the image is not remote."""
+        return self._url
+
+    @property
+    def media_type(self):
+        """Image file type taken from the file suffix, eg. 'png' or 'svg'."""
+        if self.url is not None:
+            path = pathlib.PurePosixPath(urllib.parse.urlsplit(self.url).path)
+            return path.suffix[1:]
+        return pathlib.Path(self.src).suffix[1:]
+
+    def image_info(self):
+        """Format and dimensions of the image file.
+
+        :raises OSError: Image file could not be read or fetched
+        :return: Image format and either 'size' (raster images) or root 'attrib' (SVG)
+        :rtype: dict
+        """
+        if self.url is not None:
+            return image_tools.remote_image_info(self.url)
+        return image_tools.image_info(self._im_path)
 
     def set_svg_im_size(self):
-        # Extract dimensions from SVG attributes
-        tree = ET.parse(self.src)
-        root = tree.getroot()
+        info = self.image_info()
+        if info["format"] == "SVG":
+            self.im_size = self.svg_im_size(info["attrib"])
+
+    def svg_im_size(self, attrib):
+        """Convert SVG root attributes into pixel dimensions.
+
+        :param attrib: SVG root element 'width', 'height', and 'viewBox' attributes
+        :type attrib: dict
+        :return: Width and height in pixels
+        :rtype: tuple
+        """
         try:
-            width = root.attrib["width"]
-            height = root.attrib["height"]
+            width = attrib["width"]
+            height = attrib["height"]
         except KeyError:
             # SVG can omit width and height.
             # Use viewBox dimensions instead.
-            width, height = root.attrib["viewBox"].split(" ")[-2:]
+            width, height = attrib["viewBox"].split(" ")[-2:]
         # Dimensions may (or may not) include units
         # re splits at start and end of matched group hence x3 vars
         r = re.compile(r"(^[\d\.]+)")
@@ -569,8 +1302,7 @@ class Image(SvgShape):
         # Convert to pixel dimensions
         width = self.to_pixels(width, width_units)
         height = self.to_pixels(height, height_units)
-        # Set im_size
-        self.im_size = (width, height)
+        return (width, height)
 
     def to_pixels(self, value, units):
 
@@ -624,15 +1356,8 @@ class Image(SvgShape):
             tx = tx + (self._width - tw) / 2
             ty = ty + (self._height - th) / 2
 
-            # rotate coords
-            rtx = tx * math.cos(math.radians(self.rotate)) - ty * math.sin(
-                math.radians(self.rotate)
-            )
-            rty = tx * math.sin(math.radians(self.rotate)) + ty * math.cos(
-                math.radians(self.rotate)
-            )
-            tx = rtx + self.x
-            ty = rty + self.y
+            # rotate and translate coords
+            tx, ty = self.transform.apply(tx, ty)
 
         return Coords(tx, ty)
 
@@ -642,70 +1367,115 @@ class Image(SvgShape):
 
     def loadData(self):
         """Load image data from URL or local file system."""
-        try:
-            with open(self.src, "rb") as f:
-                return f.read()
-        except OSError:
-            try:
-                with urllib.request.urlopen(self.src) as f:
-                    return f.read()
-            except urllib.error.HTTPError as e:
-                print(e.code)
+        if self.url is not None:
+            return image_tools.fetch(self.url)
+        with open(self.src, "rb") as f:
+            return f.read()
 
-    def render(self):
-        """Render SVG markup either linking or embedding an image."""
-        if isinstance(self.src, Image):
-            # src image is wrapped in <use> tag which has to replicate 'fitting' behaviour of SVG images
-            scaler = min(self._width / self.src._width, self._height / self.src._height)
-            self.scale = Coords(
-                self.scale.x * scaler,
-                self.scale.y * scaler,
-            )
-            actual_width = self.src._width * scaler
-            actual_height = self.src._height * scaler
+    def embed_key(self):
+        """Identify the embedded content of the image. Images with identical
+        keys can share a single copy of their content.
 
-            tx = (self._width - actual_width) / 2
-            ty = (self._height - actual_height) / 2
+        :return: Resolved image path and dpi
+        :rtype: tuple
+        """
+        return (self.url or pathlib.Path(self.src).resolve(), self.dpi)
 
-            # Rotate coords
-            rtx = tx * math.cos(math.radians(self.rotate)) - ty * math.sin(
-                math.radians(self.rotate)
-            )
-            rty = tx * math.sin(math.radians(self.rotate)) + ty * math.cos(
-                math.radians(self.rotate)
-            )
+    def references(self):
+        target = self.src if isinstance(self.src, Image) else self.shared_image()
+        if target is None:
+            return super().references()
+        return (target,) + super().references()
 
-            # clip-path must be a separate component when using <use> to
-            # avoid applying scale to clip-path.
-            output = Group(clip=self.clip)
-            # Reference image from defs with <use> tag
-            output.add(
-                Use(
-                    x=self.x + rtx,
-                    y=self.y + rty,
-                    scale=self.scale,
-                    tag=self.tag,
-                    instance=self.src,
-                    rotate=self.rotate,
-                )
+    def shared_image(self):
+        """Image in the diagram defs holding a shared copy of this image's
+        embedded content (see Diagram.build).
+
+        :return: Image instance or None
+        """
+        if not self.embed:
+            return None
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        shared_images = getattr(root, "shared_images", None)
+        if not shared_images:
+            return None
+        return shared_images.get(self.embed_key())
+
+    def iter_use(self, target):
+        """Render a <use> tag referencing another image fitted to this image's
+        dimensions.
+
+        :param target: Image instance in defs
+        :type target: Image
+        :return: SVG markup
+        :rtype: generator of strings
+        """
+        # target image is wrapped in <use> tag which has to replicate 'fitting' behaviour of SVG images
+        scaler = min(self._width / target._width, self._height / target._height)
+        # Scale locally so repeated renders are unaffected
+        scale = Coords(
+            self.scale.x * scaler,
+            self.scale.y * scaler,
+        )
+        actual_width = target._width * scaler
+        actual_height = target._height * scaler
+
+        tx = (self._width - actual_width) / 2
+        ty = (self._height - actual_height) / 2
+
+        # Rotate and translate coords
+        x, y = self.transform.apply(tx, ty)
+
+        # clip-path must be a separate component when using <use> to
+        # avoid applying scale to clip-path.
+        output = Group(clip=self.clip)
+        # Reference image from defs with <use> tag
+        output.add(
+            Use(
+                x=x,
+                y=y,
+                scale=scale,
+                tag=self.tag,
+                instance=target,
+                rotate=self.rotate,
             )
+        )
+        yield from output.iter_render()
 
-            return output.render()
+    def iter_render(self):
+        """Render SVG markup either linking or embedding an image."""
+        if isinstance(self.src, Image):
+            target = self.src
+        else:
+            # Embedded images used repeatedly in a diagram share a single copy
+            target = self.shared_image()
+
+        if target is not None:
+            # Markup is cached with the target it references, repeated renders
+            # reuse it rather than generating new <use> components (and ids).
+            key = (target, target._width, target._height)
+            markup = self.cached_markup()
+            if markup is None or markup[0] != key:
+                self._markup = (key, "".join(self.iter_use(target)))
+            yield self._markup[1]
+            return
 
         # Use externally referenced image
-        media_type = pathlib.Path(self.src).suffix[1:]
+        media_type = self.media_type
         tplt = templates.get("image.svg")
+        src = self.url or self.src
+        svg_data = None
 
         if self.embed:
+            # Encoded data is cached, self is left unchanged for re-rendering
+            if self.url is not None:
+                payload = image_tools.embed_data(self.loadData(), media_type)
+            else:
+                payload = image_tools.embed_file(self.src, media_type)
             if media_type == "svg":
-                data = self.loadData()
-                # Extract JUST the <svg> markup with no <XML> tag
-                tree = ET.fromstring(data)
-                self.svg_data = ET.tostring(tree)
+                svg_data = payload
             else:
-                encoded_img = base64.b64encode(self.loadData())
-                # IMPORTANT: bypass Image.src setter function
-                self._src = (
-                    f"data:image/{media_type};base64,{encoded_img.decode('utf-8')}"
-                )
-        return tplt.render(image=self)
+                src = payload.decode("utf-8")
+        yield tplt.render(image=self, src=src, svg_data=svg_data)
@@ -0,0 +1,605 @@
+import atexit
+import base64
+import collections
+import hashlib
+import http.client
+import io
+import json
+import os
+import pathlib
+import tempfile
+import urllib.parse
+import weakref
+import xml.etree.ElementTree as ET
+import PIL
+from PIL import Image as PILImage
+from pinout import config
+
+
+class LRUCache:
+    """Mapping that discards the least recently used entries beyond
+    'maxsize'. Entries can optionally persist between runs in a JSON file,
+    written by flush() rather than on every change (see flush_caches).
+
+    :param maxsize: Maximum number of entries, defaults to 256
+    :type maxsize: int, optional
+    :param filename: Name of the JSON file in the cache folder (see config.cache), defaults to None
+    :type filename: str, optional
+    """
+
+    def __init__(self, maxsize=256, filename=None):
+        self.maxsize = maxsize
+        self.filename = filename
+        self.data = collections.OrderedDict()
+        self._loaded = None
+        self._dirty = False
+        if filename:
+            persisted.add(self)
+
+    @property
+    def path(self):
+        """Path of the JSON file or None if the cache is not persisted."""
+        if self.filename and config.cache["dir"]:
+            return pathlib.Path(config.cache["dir"], self.filename)
+        return None
+
+    def load(self):
+        """Read persisted entries, once per cache folder."""
+        path = self.path
+        if path == self._loaded:
+            return
+        self._loaded = path
+        for key, value in self.read().items():
+            self.data.setdefault(key, value)
+        self.evict()
+
+    def read(self):
+        """Entries of the JSON file, empty if it does not exist."""
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except (AttributeError, OSError, ValueError):
+            # Not persisted, not created yet, or unreadable
+            return {}
+
+    def save(self, merge=True):
+        """Write entries to the JSON file.
+
+        :param merge: Keep entries other processes (eg. batch export workers) have written since the file was read, defaults to True
+        :type merge: bool, optional
+        """
+        path = self.path
+        if path is None:
+            return
+        if merge:
+            entries = collections.OrderedDict(
+                (key, value)
+                for key, value in self.read().items()
+                if key not in self.data
+            )
+            entries.update(self.data)
+            self.data = entries
+            self.evict()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically, batch exports may share the cache folder
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, path)
+
+    def flush(self):
+        """Write entries changed since they were last written."""
+        if self._dirty:
+            self._dirty = False
+            self.save()
+
+    def evict(self):
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def get(self, key, default=None):
+        self.load()
+        try:
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.data[key]
+
+    def set(self, key, value):
+        self.load()
+        self.data[key] = value
+        self.data.move_to_end(key)
+        self.evict()
+        self._dirty = True
+
+    def clear(self):
+        self.data.clear()
+        self._dirty = False
+        self.save(merge=False)
+
+
+# Persisted LRUCache instances, written by flush_caches()
+persisted = weakref.WeakSet()
+
+
+def flush_caches():
+    """Write changed entries of all persisted caches. Called after each
+    export and when the process exits."""
+    for cache in list(persisted):
+        cache.flush()
+
+
+atexit.register(flush_caches)
+
+
+class ContentCache:
+    """Cache of binary content held in memory, with least recently used
+    entries discarded beyond 'maxsize'. Entries can optionally persist
+    between runs as files in a sub-folder of the cache folder (see config.cache).
+
+    :param maxsize: Maximum number of entries held in memory, defaults to 64
+    :type maxsize: int, optional
+    :param folder: Name of the sub-folder entries persist in, defaults to None
+    :type folder: str, optional
+    :param maxfiles: Maximum number of persisted entries, least recently used files are deleted beyond it, defaults to None (unlimited)
+    :type maxfiles: int, optional
+    """
+
+    def __init__(self, maxsize=64, folder=None, maxfiles=None):
+        self.memory = LRUCache(maxsize)
+        self.folder = folder
+        self.maxfiles = maxfiles
+
+    @property
+    def path(self):
+        """Path of the sub-folder or None if entries are not persisted."""
+        if self.folder and config.cache["dir"]:
+            return pathlib.Path(config.cache["dir"], self.folder)
+        return None
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.path:
+            try:
+                value = (self.path / key).read_bytes()
+                if self.maxfiles:
+                    # Modification time orders files by use
+                    os.utime(self.path / key)
+            except OSError:
+                return default
+            self.memory.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        path = self.path
+        if path is None:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp, path / key)
+        if self.maxfiles:
+            self.evict_files()
+
+    def evict_files(self):
+        """Delete the least recently used files beyond 'maxfiles'."""
+        files = []
+        for file in self.path.iterdir():
+            try:
+                if file.suffix != ".tmp":
+                    files.append((file.stat().st_mtime_ns, file))
+            except OSError:
+                # Deleted by another process
+                continue
+        files.sort()
+        for _, file in files[: max(len(files) - self.maxfiles, 0)]:
+            try:
+                file.unlink()
+            except OSError:
+                continue
+
+    def clear(self):
+        self.memory.clear()
+
+
+# Process-wide cache of image dimensions
+image_info_cache = LRUCache(config.cache["image_info_size"], "image_info.json")
+
+# Process-wide cache of encoded image data, keyed by content hash
+embed_cache = ContentCache(
+    config.cache["embed_size"], "embed", config.cache["embed_files"]
+)
+
+# Content hash of local files, keyed by path, mtime, and size
+file_digests = LRUCache(config.cache["image_info_size"])
+
+
+class FetchError(OSError):
+    """Remote content could not be fetched."""
+
+
+class Fetcher:
+    """Fetch remote content over HTTP(S).
+
+    Connections are kept alive and reused for each host. Fetched content is
+    held in memory so a URL is downloaded at most once per build (see
+    expire). Responses with an ETag or Last-Modified header can persist
+    between runs in the cache folder (see config.cache), later builds only
+    download them again if the server reports a change.
+
+    :param timeout: Seconds to wait for a server, defaults to config.remote["timeout"]
+    :type timeout: float, optional
+    :param offline: Only return cached content, defaults to config.remote["offline"]
+    :type offline: bool, optional
+    """
+
+    max_redirects = 5
+
+    def __init__(self, timeout=None, offline=None):
+        self.timeout = timeout
+        self.offline = offline
+        self.connections = {}
+        self.fetched = {}
+        # Response validators (ETag/Last-Modified) and content of cached URLs
+        self.validators = LRUCache(config.cache["image_info_size"], "http.json")
+        self.content = ContentCache(
+            config.cache["embed_size"], "http", config.cache["embed_files"]
+        )
+
+    def expire(self):
+        """Start a new build, URLs fetched previously are revalidated when
+        next fetched."""
+        self.fetched.clear()
+
+    def close(self):
+        """Close all kept-alive connections."""
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+    def fetch(self, url):
+        """Content of a remote URL.
+
+        :param url: http or https URL
+        :type url: str
+        :raises FetchError: Content could not be fetched, or is not cached in offline mode
+        :return: Response body
+        :rtype: bytes
+        """
+        data = self.fetched.get(url)
+        if data is not None:
+            return data
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        validators = self.validators.get(url)
+        cached = self.content.get(key) if validators else None
+
+        offline = config.remote["offline"] if self.offline is None else self.offline
+        if offline:
+            if cached is None:
+                raise FetchError(f"'{url}' is not cached and fetching is offline.")
+            data = cached
+        else:
+            headers = {}
+            if cached is not None:
+                if "etag" in validators:
+                    headers["If-None-Match"] = validators["etag"]
+                if "last_modified" in validators:
+                    headers["If-Modified-Since"] = validators["last_modified"]
+            response, data = self.request(url, headers)
+            if response.status == 304:
+                data = cached
+            else:
+                validators = {
+                    name: response.getheader(header)
+                    for name, header in (
+                        ("etag", "ETag"),
+                        ("last_modified", "Last-Modified"),
+                    )
+                    if response.getheader(header)
+                }
+                if validators:
+                    self.content.set(key, data)
+                    self.validators.set(url, validators)
+
+        self.fetched[url] = data
+        return data
+
+    def request(self, url, headers):
+        """Send a GET request, following redirects.
+
+        :param url: http or https URL
+        :type url: str
+        :param headers: Request headers
+        :type headers: dict
+        :raises FetchError: Request failed or the server responded with an error
+        :return: Response and its body
+        :rtype: tuple
+        """
+        for _ in range(self.max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            if parts.scheme not in ("http", "https"):
+                raise FetchError(f"'{url}' is not an http(s) URL.")
+            path = parts.path or "/"
+            if parts.query:
+                path += f"?{parts.query}"
+            response = self.send((parts.scheme, parts.netloc), path, headers)
+            data = response.read()
+            if response.status in (301, 302, 303, 307, 308):
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                continue
+            if response.status not in (200, 304):
+                raise FetchError(
+                    f"'{url}' responded {response.status} {response.reason}."
+                )
+            return response, data
+        raise FetchError(f"'{url}' redirected too many times.")
+
+    def send(self, host, path, headers):
+        """Send a request on the kept-alive connection to 'host'. A
+        connection closed by the server is replaced once."""
+        scheme, netloc = host
+        for attempt in range(2):
+            conn = self.connections.get(host)
+            if conn is None:
+                timeout = (
+                    config.remote["timeout"] if self.timeout is None else self.timeout
+                )
+                if scheme == "https":
+                    conn = http.client.HTTPSConnection(netloc, timeout=timeout)
+                else:
+                    conn = http.client.HTTPConnection(netloc, timeout=timeout)
+                self.connections[host] = conn
+            try:
+                conn.request("GET", path, headers=headers)
+                return conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                del self.connections[host]
+                conn.close()
+                stale = isinstance(e, (http.client.HTTPException, ConnectionError))
+                if attempt or not stale:
+                    raise FetchError(
+                        f"Fetching '{path}' from {netloc} failed: {e}"
+                    ) from e
+
+
+# Fetcher of remote images. Replace with any object providing a 'fetch(url)'
+# method to customise how remote content is fetched.
+fetcher = Fetcher()
+
+
+def is_url(src):
+    """Test if an image source refers to remote content.
+
+    :param src: Image source
+    :type src: str
+    :rtype: bool
+    """
+    return urllib.parse.urlsplit(str(src)).scheme in ("http", "https")
+
+
+def fetch(url):
+    """Content of a remote URL fetched with the module 'fetcher'.
+
+    :param url: http or https URL
+    :type url: str
+    :raises FetchError: Content could not be fetched
+    :return: Response body
+    :rtype: bytes
+    """
+    return fetcher.fetch(url)
+
+
+def file_key(path):
+    """Cache key identifying the current version of a local file.
+
+    :param path: Path to file
+    :type path: pathlib.Path or str
+    :return: Resolved path, modification time, and size of the file
+    :rtype: str
+    """
+    path = pathlib.Path(path).resolve()
+    stat = path.stat()
+    return f"{path}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def file_digest(path):
+    """Content hash of a local file. Unmodified files are not re-read.
+
+    :param path: Path to file
+    :type path: pathlib.Path or str
+    :raises OSError: 'path' is not a local file
+    :return: sha256 hex digest of the file content
+    :rtype: str
+    """
+    key = file_key(path)
+    digest = file_digests.get(key)
+    if digest is None:
+        digest = hashlib.sha256(pathlib.Path(path).read_bytes()).hexdigest()
+        file_digests.set(key, digest)
+    return digest
+
+
+def png_size(header):
+    # IHDR chunk is always first, width and height follow its type
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+        return int.from_bytes(header[16:20], "big"), int.from_bytes(
+            header[20:24], "big"
+        )
+
+
+def gif_size(header):
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return int.from_bytes(header[6:8], "little"), int.from_bytes(
+            header[8:10], "little"
+        )
+
+
+def jpeg_size(f):
+    """Read dimensions from the first start-of-frame segment of a JPEG."""
+    f.seek(0)
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # Padding byte
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            # Markers without a length
+            continue
+        data = f.read(2)
+        length = int.from_bytes(data, "big")
+        if len(data) < 2 or length < 2:
+            # Truncated or corrupt segment
+            return None
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            return int.from_bytes(data[3:5], "big"), int.from_bytes(data[1:3], "big")
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def svg_attrib(f):
+    """Read dimension attributes of the SVG root element only."""
+    f.seek(0)
+    for _, root in ET.iterparse(f, events=("start",)):
+        keys = ("width", "height", "viewBox")
+        return {k: root.attrib[k] for k in keys if k in root.attrib}
+
+
+def probe_image(path):
+    """Read the format and dimensions of a local image file.
+
+    Only the file header (raster images) or root element (SVG) is read.
+
+    :param path: Path to image file
+    :type path: pathlib.Path or str
+    :return: Image format and either 'size' (raster images) or root 'attrib' (SVG)
+    :rtype: dict
+    """
+    with open(path, "rb") as f:
+        return probe_stream(f)
+
+
+def probe_stream(f):
+    """Read the format and dimensions of an image from a binary file object.
+
+    :param f: Image data
+    :type f: file object
+    :return: Image format and either 'size' (raster images) or root 'attrib' (SVG)
+    :rtype: dict
+    """
+    header = f.read(32)
+    for fmt, size in (("PNG", png_size(header)), ("GIF", gif_size(header))):
+        if size:
+            return {"format": fmt, "size": list(size)}
+    size = jpeg_size(f)
+    if size:
+        return {"format": "JPEG", "size": list(size)}
+    if not header.lstrip().startswith(b"<"):
+        # Other formats supported by Pillow
+        try:
+            with PILImage.open(f) as im:
+                return {"format": im.format, "size": list(im.size)}
+        except PIL.UnidentifiedImageError:
+            pass
+    # Image is assumed to be SVG
+    return {"format": "SVG", "attrib": svg_attrib(f)}
+
+
+def image_info(path):
+    """Format and dimensions of a local image file. Results are cached until
+    the file is modified.
+
+    :param path: Path to image file
+    :type path: pathlib.Path or str
+    :raises OSError: 'path' is not a local file
+    :return: Image format and either 'size' (raster images) or root 'attrib' (SVG)
+    :rtype: dict
+    """
+    image_info_cache.maxsize = config.cache["image_info_size"]
+    key = file_key(path)
+    info = image_info_cache.get(key)
+    if info is None:
+        info = probe_image(path)
+        image_info_cache.set(key, info)
+    return info
+
+
+def remote_image_info(url):
+    """Format and dimensions of a remote image. Results are cached by content.
+
+    :param url: http or https URL
+    :type url: str
+    :raises FetchError: Image could not be fetched
+    :return: Image format and either 'size' (raster images) or root 'attrib' (SVG)
+    :rtype: dict
+    """
+    data = fetch(url)
+    key = f"sha256:{hashlib.sha256(data).hexdigest()}"
+    info = image_info_cache.get(key)
+    if info is None:
+        info = probe_stream(io.BytesIO(data))
+        image_info_cache.set(key, info)
+    return info
+
+
+def embed_data(data, media_type):
+    """Encode image data for embedding in SVG markup. Results are cached by
+    content so identical images are only encoded once.
+
+    :param data: Image file data
+    :type data: bytes
+    :param media_type: Image file type, eg. 'png' or 'svg'
+    :type media_type: str
+    :return: <svg> markup (SVG) or a base64 data URI (raster images)
+    :rtype: bytes
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    return _embed(data, digest, media_type)
+
+
+def embed_file(path, media_type):
+    """Encode a local image file for embedding in SVG markup. Unmodified files
+    are not re-read once encoded.
+
+    :param path: Path to image file
+    :type path: pathlib.Path or str
+    :param media_type: Image file type, eg. 'png' or 'svg'
+    :type media_type: str
+    :raises OSError: 'path' is not a local file
+    :return: <svg> markup (SVG) or a base64 data URI (raster images)
+    :rtype: bytes
+    """
+    key = file_key(path)
+    digest = file_digests.get(key)
+    if digest is not None:
+        payload = embed_cache.get(f"{digest}.{media_type}")
+        if payload is not None:
+            return payload
+    data = pathlib.Path(path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    file_digests.set(key, digest)
+    return _embed(data, digest, media_type)
+
+
+def _embed(data, digest, media_type):
+    key = f"{digest}.{media_type}"
+    payload = embed_cache.get(key)
+    if payload is None:
+        if media_type == "svg":
+            # Extract JUST the <svg> markup with no <XML> tag
+            payload = ET.tostring(ET.fromstring(data))
+        else:
+            encoded = base64.b64encode(data)
+            payload = f"data:image/{media_type};base64,".encode("utf-8") + encoded
+        embed_cache.set(key, payload)
+    return payload
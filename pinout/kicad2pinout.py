@@ -1,16 +1,19 @@
 from collections import namedtuple
 import copy
-import math
-import tokenize
-from tokenize import ENDMARKER, LPAR, RPAR, NAME, NUMBER, OP
+import mmap
+import os
 import re
 import warnings
 
 from pinout.components.pinlabel import PinLabelGroup
 from pinout.components.annotation import AnnotationLabel
+from pinout.transform import Transform
 
 Pinout_item = namedtuple("Pinout_item", ["content", "attrs", "x", "y", "scale"])
 
+# s-expression tokens: parentheses, quoted strings, and atoms
+SEXPR_TOKEN = re.compile(rb'[()]|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+
 
 def format_tag_warning(message, category, filename, lineno, file=None, line=None):
     return f"{category.__name__}: {message}"
@@ -20,50 +23,51 @@ def rotate_point_coord(coord, rotate):
     """Rotate a coordinate around (0,0) by angle in degrees."""
     # Rotate in opposite direction to kicad for SVG coordinate space
     rotate = -rotate
-    x, y = coord
-    x1 = x * math.cos(math.radians(rotate)) - y * math.sin(math.radians(rotate))
-    y1 = x * math.sin(math.radians(rotate)) + y * math.cos(math.radians(rotate))
-    return (x1, y1)
-
-
-class Counter:
-    def __init__(self, start_num):
-        self.count = start_num
-
-    def __call__(self):
-        self.count += 1
-        return self.count
-
-
-class Tokens:
-    def __init__(self, filepath):
-        self.tokens = self.load_tokens(filepath)
-        self.depth = 0
-        self.current = None
-        # Get initial value
-        self.next()
+    return Transform.rotation(rotate).apply(*coord)
+
+
+def parse_sexpr(data):
+    """Parse s-expression bytes into a tree.
+
+    Nodes are lists with the node name as the first item. Atoms are strings,
+    quoted strings retain their quotes.
+
+    :param data: s-expression data
+    :type data: bytes or buffer (eg. mmap)
+    :return: Root node
+    :rtype: list
+    """
+    root = []
+    stack = [root]
+    node = root
+    for match in SEXPR_TOKEN.finditer(data):
+        token = match[0]
+        if token == b"(":
+            child = []
+            node.append(child)
+            stack.append(child)
+            node = child
+        elif token == b")":
+            stack.pop()
+            node = stack[-1]
+        else:
+            node.append(token.decode("utf-8"))
+    return root[0]
 
-    def next(self):
-        self.current = next(self.tokens)
-        self.update_depth(self.current)
-        return self.current
 
-    def goto(self, name):
-        while self.current.string != name:
-            self.next()
-        return True
+def load_tree(filepath):
+    """Parse a KiCad file into an s-expression tree.
 
-    def load_tokens(self, filepath):
-        with tokenize.open(filepath) as f:
-            tokens = tokenize.generate_tokens(f.readline)
-            for tok in tokens:
-                yield tok
+    The file is memory mapped rather than read into memory.
 
-    def update_depth(self, token):
-        if token.exact_type == LPAR:
-            self.depth += 1
-        elif token.exact_type == RPAR:
-            self.depth -= 1
+    :param filepath: Path to KiCad file
+    :type filepath: str
+    :return: Root node
+    :rtype: list
+    """
+    with open(filepath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse_sexpr(data)
 
 
 class KiCadParser:
@@ -71,61 +75,56 @@ class KiCadParser:
         self.dpi = dpi
         self.filepath = pcb_file
         self.version = version
-
-    def fp_text(self, tokens):
-        exit_depth = tokens.depth
+        self._tree = None
+        self._index = None
+        self._mtime = None
+
+    @property
+    def tree(self):
+        """s-expression tree of the KiCad file, parsed on first access and
+        again if the file is modified."""
+        mtime = os.stat(self.filepath).st_mtime_ns
+        if self._tree is None or mtime != self._mtime:
+            self._mtime = mtime
+            self._tree = load_tree(self.filepath)
+            # Index top-level nodes by name
+            self._index = {}
+            for node in self._tree[1:]:
+                if isinstance(node, list) and node:
+                    self._index.setdefault(node[0], []).append(node)
+        return self._tree
+
+    def nodes(self, name, parent=None):
+        """Child nodes named 'name', of 'parent' or the top-level node."""
+        if parent is None:
+            self.tree
+            return self._index.get(name, [])
+        return [n for n in parent[1:] if isinstance(n, list) and n and n[0] == name]
+
+    def fp_text(self, node):
         fp_text = {
-            "type": tokens.next().string.strip('"'),
-            "text": tokens.next().string.strip('"'),
-        }
-        while tokens.depth >= exit_depth:
-            if tokens.current.type == NAME:
-                if tokens.current.string == "at":
-                    fp_text["at"] = self.at(tokens)
-                if tokens.current.string == "layer":
-                    fp_text["layer"] = tokens.next().string.strip('"')
-            tokens.next()
-        return fp_text
-
-    def fp_text_kicad_5(self, tokens):
-        exit_depth = tokens.depth
-        fp_text = {
-            "type": tokens.next().string,
-            "text": "",
+            "type": node[1].strip('"'),
+            "text": node[2].strip('"'),
             "layer": "",
         }
-        # collate text until attribute starts
-        while tokens.next().exact_type != LPAR:
-            fp_text["text"] += tokens.current.string.strip('"')
-
-        # Find and collate attributes
-        tokens.next()
-        while tokens.depth >= exit_depth:
-            if tokens.current.type == NAME:
-                if tokens.current.string == "at":
-                    fp_text["at"] = self.at(tokens)
-                if tokens.current.string == "layer":
-                    while tokens.current.exact_type != RPAR:
-                        fp_text["layer"] += tokens.next().string
-            tokens.next()
+        for child in node[3:]:
+            if isinstance(child, list) and child:
+                if child[0] == "at":
+                    fp_text["at"] = self.at(child)
+                elif child[0] == "layer":
+                    fp_text["layer"] = child[1].strip('"')
         return fp_text
 
-    def at(self, tokens):
+    def at(self, node):
 
         # 'at' can be 2 to 3 numbers. x, y, (and optional) rotation
         at = []
-        prefix = ""
-        exit_depth = tokens.depth
-        while tokens.depth >= exit_depth:
-            if tokens.current.type == NUMBER:
-                at.append(prefix + tokens.current.string.strip('"'))
-                prefix = ""
-            elif tokens.current.type == OP:
-                prefix = tokens.current.string
-            tokens.next()
-
-        # Convert strings into numbers
-        at = [float(num) for num in at]
+        for atom in node[1:]:
+            try:
+                at.append(float(atom.strip('"')))
+            except (AttributeError, ValueError):
+                # Ignore flags such as 'unlocked'
+                pass
 
         # Convert x and y (mm) values to px.
         # !!! Do NOT convert rotation value
@@ -137,9 +136,7 @@ class KiCadParser:
         return mm / 25.5 * self.dpi
 
     def get_single_attr(self, key):
-        tokens = Tokens(self.filepath)
-        tokens.goto(key)
-        return tokens.next().string.strip('"')
+        return self.nodes(key)[0][1].strip('"')
 
     def version(self):
         return self.get_single_attr("version")
@@ -152,44 +149,27 @@ class KiCadParser:
 
     def general(self):
         general = {}
-        tokens = Tokens(self.filepath)
-        tokens.goto("general")
-        exit_depth = tokens.depth
-        while tokens.depth >= exit_depth:
-            # Assumes all entries are (key value) pairs
-            if tokens.current.type == NAME and tokens.depth == exit_depth + 1:
-                key = tokens.current.string.strip('"')
-                val = tokens.next()
-                if val.type == NUMBER:
-                    general[key] = float(val.string)
-                else:
-                    general[key] = val.string.strip('"')
-            tokens.next()
+        # Assumes all entries are (key value) pairs
+        for node in self.nodes("general")[0][1:]:
+            key, val = node[0].strip('"'), node[1]
+            try:
+                general[key] = float(val)
+            except ValueError:
+                general[key] = val.strip('"')
         return general
 
     def layers(self):
         layers = {}
-        tokens = Tokens(self.filepath)
-        tokens.goto("layers")
-        exit_depth = tokens.depth
-        while tokens.depth >= exit_depth:
-            if tokens.current.type == NUMBER:
-                key = int(tokens.current.string)
-                layers[key] = {
-                    "canonical_name": tokens.next().string.strip('"'),
-                    "type": tokens.next().string.strip('"'),
-                    "user_name": None,
-                }
-                if tokens.next().type != OP:
-                    layers[key]["user_name"] = tokens.current.string.strip('"')
-            tokens.next()
+        for node in self.nodes("layers")[0][1:]:
+            layers[int(node[0])] = {
+                "canonical_name": node[1].strip('"'),
+                "type": node[2].strip('"'),
+                "user_name": node[3].strip('"') if len(node) > 3 else None,
+            }
         return layers
 
     def footprints(self):
-        # counter used give unique id to each footprint
-        counter = Counter(0)
         footprints = []
-        tokens = Tokens(self.filepath)
 
         # Set footprint name depending on KiCad version
         if self.version < 6:
@@ -197,65 +177,28 @@ class KiCadParser:
         else:
             fooprint_name = "footprint"
 
-        while tokens.current.type != ENDMARKER:
-            if tokens.current.type == NAME and tokens.current.string == fooprint_name:
-                fp = {
-                    "id": counter(),
-                    "at": None,
-                    "fp_text": [],
-                    "layer": "",
-                    "name": tokens.next().string.strip('"'),
-                }
-                exit_depth = tokens.depth
-
-                if self.version >= 6:
-
-                    while tokens.depth >= exit_depth:
-                        tokens.next()
-                        if tokens.current.type == NAME:
-                            if tokens.current.string == "layer":
-                                fp["layer"] = tokens.next().string.strip('"')
-                            if tokens.current.string == "at":
-                                fp["at"] = self.at(tokens)
-                            if tokens.current.string == "fp_text":
-                                fp["fp_text"].append(self.fp_text(tokens))
-                    footprints.append(fp)
-
-                else:
-                    #####################################################
-                    # KiCad 5 does NOT wrap attribute strings in quotes #
-                    # tokens need to be collated until end of attribute.#
-                    #####################################################
-                    while tokens.next().exact_type != LPAR:
-                        fp["name"] += tokens.current.string
-
-                    while tokens.depth >= exit_depth:
-                        if (
-                            tokens.next().type == NAME
-                            and tokens.depth == exit_depth + 1
-                        ):
-                            if tokens.current.string == "layer":
-                                while tokens.next().exact_type != RPAR:
-                                    fp["layer"] += tokens.current.string
-                            elif tokens.current.string == "at":
-                                fp["at"] = self.at(tokens)
-                            elif tokens.current.string == "fp_text":
-                                fp["fp_text"].append(self.fp_text_kicad_5(tokens))
-
-                            tokens.next()
-                    footprints.append(fp)
-
-            tokens.next()
+        # counter used give unique id to each footprint
+        for i, node in enumerate(self.nodes(fooprint_name), 1):
+            fp = {
+                "id": i,
+                "at": None,
+                "fp_text": [],
+                "layer": "",
+                "name": node[1].strip('"'),
+            }
+            for child in node[2:]:
+                if isinstance(child, list) and child:
+                    if child[0] == "layer":
+                        fp["layer"] = child[1].strip('"')
+                    elif child[0] == "at":
+                        fp["at"] = self.at(child)
+                    elif child[0] == "fp_text":
+                        fp["fp_text"].append(self.fp_text(child))
+            footprints.append(fp)
         return footprints
 
     def gr_text(self):
-        text_list = []
-        tokens = Tokens(self.filepath)
-        while tokens.next().type != ENDMARKER:
-            if tokens.current.type == NAME and tokens.current.string == "gr_text":
-                content = tokens.next().string.strip('"')
-                text_list.append(content)
-        return text_list
+        return [node[1].strip('"') for node in self.nodes("gr_text")]
 
 
 class PinoutParser(KiCadParser):
@@ -264,6 +207,7 @@ class PinoutParser(KiCadParser):
     def __init__(self, filepath, dpi=72, version=6):
         super().__init__(filepath, dpi, version)
         self.pinout_img = None
+        self._footprints = None
 
     def layers(self):
         layers = super().layers()
@@ -278,6 +222,17 @@ class PinoutParser(KiCadParser):
         self.pinout_img = image_instance
 
     def footprints(self):
+        """Pinout footprints with coordinates relative to the pinout origin.
+
+        The result is cached until the KiCad file is modified, treat it as
+        read-only.
+        """
+        tree = self.tree
+        if self._footprints is None or self._footprints[0] is not tree:
+            self._footprints = (tree, self._pinout_footprints())
+        return self._footprints[1]
+
+    def _pinout_footprints(self):
         pinout_fps = []
         pinout_origin = [0, 0]
         fps = super().footprints()
@@ -372,94 +327,100 @@ class PinoutParser(KiCadParser):
 
     def add_pinlabels(self, container):
         for fp in self.footprints():
-
             self.transfer_footprint_coords(fp)
-
-            # Get transformed footprint coords
-            pin_x, pin_y = self.pinout_img.coord(f"footprint_{fp['id']}")
-
-            # Add pinlabels
             if fp["name"] == "pinout:PinLabel":
-                self.transfer_footprint_coords(fp)
-
-                # Get transformed footprint coords
-                pin_x, pin_y = self.pinout_img.coord(f"footprint_{fp['id']}")
-
-                fp_specs = self.get_footprint_specs(fp)
-
-                # Parse label content
-                tags = [
-                    t[2:-2]
-                    for t in re.findall(
-                        "{{-?[_a-zA-Z]+[_a-zA-Z0-9-]*}}", fp_specs.content
-                    )
-                ]
-                txts = [
-                    t.strip()
-                    for t in re.split(
-                        "{{-?[_a-zA-Z]+[_a-zA-Z0-9-]*}}", fp_specs.content
-                    )
-                    if t
-                ]
-                if len(txts) > len(tags):
-                    # User has fogotten to include tags on pinlabels
-                    # Warn them and add place-holder tags
-                    len_diff = len(txts) - len(tags)
-                    txts += ["no_tag_assigned"] * len_diff
-
-                    warnings.formatwarning = format_tag_warning
-                    warnings.warn(
-                        "pin-label(s) have not been assigned a tag in KiCad.",
-                        SyntaxWarning,
-                    )
-
-                labels = list(zip(txts, tags))
-                # Create pinlabel group
-                container.add(
-                    PinLabelGroup(
-                        x=pin_x,
-                        y=pin_y,
-                        pin_pitch=(0, 0),
-                        label_start=(abs(fp_specs.x), abs(fp_specs.y)),
-                        label_pitch=(0, 0),
-                        labels=[labels],
-                        scale=fp_specs.scale,
-                        leaderline={"direction": fp_specs.attrs[0]},
-                    )
-                )
+                self.add_pinlabel(container, fp)
 
     def add_annotations(self, container):
         for fp in self.footprints():
-
             if fp["name"] == "pinout:Annotation":
-                scale = (1, 1)
                 self.transfer_footprint_coords(fp)
+                self.add_annotation(container, fp)
+
+    def populate(self, container):
+        """Add pin-labels and annotations to container in a single pass over
+        the footprints."""
+        for fp in self.footprints():
+            self.transfer_footprint_coords(fp)
+            if fp["name"] == "pinout:PinLabel":
+                self.add_pinlabel(container, fp)
+            elif fp["name"] == "pinout:Annotation":
+                self.add_annotation(container, fp)
+
+    def add_pinlabel(self, container, footprint):
+        """Add a PinLabelGroup from a pinout:PinLabel footprint. Footprint
+        coords must first be transferred to the linked image."""
+        # Get transformed footprint coords
+        pin_x, pin_y = self.pinout_img.coord(f"footprint_{footprint['id']}")
+
+        fp_specs = self.get_footprint_specs(footprint)
+
+        # Parse label content
+        tags = [
+            t[2:-2]
+            for t in re.findall("{{-?[_a-zA-Z]+[_a-zA-Z0-9-]*}}", fp_specs.content)
+        ]
+        txts = [
+            t.strip()
+            for t in re.split("{{-?[_a-zA-Z]+[_a-zA-Z0-9-]*}}", fp_specs.content)
+            if t
+        ]
+        if len(txts) > len(tags):
+            # User has fogotten to include tags on pinlabels
+            # Warn them and add place-holder tags
+            len_diff = len(txts) - len(tags)
+            txts += ["no_tag_assigned"] * len_diff
+
+            warnings.formatwarning = format_tag_warning
+            warnings.warn(
+                "pin-label(s) have not been assigned a tag in KiCad.",
+                SyntaxWarning,
+            )
+
+        labels = list(zip(txts, tags))
+        # Create pinlabel group
+        container.add(
+            PinLabelGroup(
+                x=pin_x,
+                y=pin_y,
+                pin_pitch=(0, 0),
+                label_start=(abs(fp_specs.x), abs(fp_specs.y)),
+                label_pitch=(0, 0),
+                labels=[labels],
+                scale=fp_specs.scale,
+                leaderline={"direction": fp_specs.attrs[0]},
+            )
+        )
+
+    def add_annotation(self, container, footprint):
+        """Add an AnnotationLabel from a pinout:Annotation footprint. Footprint
+        coords must first be transferred to the linked image."""
+        scale = (1, 1)
+        # Get transformed footprint coords
+        pin_x, pin_y = self.pinout_img.coord(f"footprint_{footprint['id']}")
 
-                # Get transformed footprint coords
-                pin_x, pin_y = self.pinout_img.coord(f"footprint_{fp['id']}")
-
-                for fp_text in fp["fp_text"]:
-                    # Get annotation attrs
-                    if fp_text["type"] == "user":
-                        # Excepted format: <leaderline direction>
-                        direction, *_ = fp_text["text"].split(" ")
-
-                    elif fp_text["type"] == "value":
-                        x, y = self.pinout_img.coord(
-                            f"{fp_text['text']}_{fp['id']}", raw=True
-                        )
-                        tag, content = self.extract_tags(fp_text["text"])
-
-                        scale = self.get_scale(x, y)
-
-                container.add(
-                    AnnotationLabel(
-                        tag=tag,
-                        content=content,
-                        x=pin_x,
-                        y=pin_y,
-                        body={"x": abs(x), "y": abs(y)},
-                        scale=scale,
-                        leaderline={"direction": direction},
-                    )
+        for fp_text in footprint["fp_text"]:
+            # Get annotation attrs
+            if fp_text["type"] == "user":
+                # Excepted format: <leaderline direction>
+                direction, *_ = fp_text["text"].split(" ")
+
+            elif fp_text["type"] == "value":
+                x, y = self.pinout_img.coord(
+                    f"{fp_text['text']}_{footprint['id']}", raw=True
                 )
+                tag, content = self.extract_tags(fp_text["text"])
+
+                scale = self.get_scale(x, y)
+
+        container.add(
+            AnnotationLabel(
+                tag=tag,
+                content=content,
+                x=pin_x,
+                y=pin_y,
+                body={"x": abs(x), "y": abs(y)},
+                scale=scale,
+                leaderline={"direction": direction},
+            )
+        )
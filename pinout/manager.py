@@ -2,13 +2,22 @@
 
 import argparse
 import collections.abc
+import concurrent.futures
+import contextlib
+import copy
+import glob
+import gzip
+import hashlib
 import importlib
+import json
 import os
+import shlex
 import sys
+import time
 
 from importlib import resources as imresources
 from pathlib import Path
-from pinout import core
+from pinout import config, core, image_tools
 from pinout import __name__ as pkg_name
 
 try:
@@ -17,6 +26,12 @@ except ImportError as e:
     pass
     # export as other (non svg) formats is not available
 
+try:
+    from importlib import metadata
+except ImportError:
+    # Python < 3.8, the installed version is not part of build records
+    metadata = None
+
 # user variables
 # C:\Program Files\mingw-w64\x86_64-8.1.0-posix-seh-rt_v6-rev0\mingw64\bin
 
@@ -117,8 +132,12 @@ def create_stylesheet(src, path, instance_name="diagram", overwrite=False):
 
     diagram = get_diagram_instance(src, instance_name)
 
+    components = diagram.find_children_by_types(
+        diagram, PinLabel, Legend, Panel, AnnotationLabel, DIP, QFP
+    )
+
     # Extract css class tags from PinLabels
-    lbls = diagram.find_children_by_type(diagram, PinLabel)
+    lbls = components[PinLabel]
     tags = list(set([tag for label in lbls for tag in label.tag.strip().split(" ")]))
     if config.pinlabel["tag"] in tags:
         tags.remove(config.pinlabel["tag"])
@@ -127,15 +146,15 @@ def create_stylesheet(src, path, instance_name="diagram", overwrite=False):
     if tags:
         context["tags"] = style_tools.assign_color(tags)
         context["pinlabel"] = config.pinlabel
-    if diagram.find_children_by_type(diagram, Legend):
+    if components[Legend]:
         context["legend"] = config.legend
-    if diagram.find_children_by_type(diagram, Panel):
+    if components[Panel]:
         context["panel"] = config.panel
-    if diagram.find_children_by_type(diagram, AnnotationLabel):
+    if components[AnnotationLabel]:
         context["annotation"] = config.annotation
-    if diagram.find_children_by_type(diagram, DIP):
+    if components[DIP]:
         context["ic_dip"] = config.ic_dip
-    if diagram.find_children_by_type(diagram, QFP):
+    if components[QFP]:
         context["ic_qfp"] = config.ic_qfp
     if isinstance(diagram, Diagram_2Columns) or isinstance(diagram, Diagram_2Rows):
         context["diagram_presets"] = config.diagram_presets
@@ -196,84 +215,504 @@ def duplicate(resource_name, *args):
             print(f"{filename} duplicated.")
 
 
-def export_diagram(src, dest, instance_name="diagram", overwrite=False):
-    # reset core.diagram_id.counter. Pytest can create multiple diagrams
-    # and requires each new diagram's id counter to commence at 0.
-    core.diagram_id.counter = 0
+# SVG export formats, .svgz files are gzip compressed
+SVG_FORMATS = (".svg", ".svgz")
+# Export formats available in addition to SVG and their cairosvg converter
+CAIROSVG_FORMATS = {".png": "svg2png", ".pdf": "svg2pdf", ".ps": "svg2ps"}
+
+
+# Records of exported files, one file per record so batch exports do not
+# overwrite each other's records (see build_key)
+build_records = image_tools.ContentCache(
+    folder="build_records", maxfiles=config.cache["build_size"]
+)
+
+# Exported files of recorded builds, keyed by content hash
+build_artifacts = image_tools.ContentCache(
+    folder="builds", maxfiles=config.cache["build_size"]
+)
+
+
+# Files opened for reading while a diagram script runs (see record_reads),
+# None when no script is running
+script_reads = None
+# Audit hooks cannot be removed, the hook recording reads is added once
+audit_hooked = False
+
+
+def _audit_open(event, args):
+    if event != "open" or script_reads is None:
+        return
+    path, mode, flags = args
+    if isinstance(path, (str, bytes, os.PathLike)) and not flags & (
+        os.O_WRONLY | os.O_RDWR
+    ):
+        script_reads.add(os.path.abspath(os.fsdecode(path)))
+
+
+@contextlib.contextmanager
+def record_reads():
+    """Record files opened for reading within the context, eg. data files
+    read by a diagram script. Files are recorded via an audit hook, the
+    hook is added on first use.
+
+    :return: Paths of the files, None if they cannot be recorded (Python < 3.8)
+    :rtype: set
+    """
+    global script_reads, audit_hooked
+    if not hasattr(sys, "addaudithook"):
+        yield None
+        return
+    if not audit_hooked:
+        sys.addaudithook(_audit_open)
+        audit_hooked = True
+    script_reads = paths = set()
+    try:
+        yield paths
+    finally:
+        script_reads = None
+
+
+def pinout_version():
+    """Installed version of pinout. None if pinout is not installed, eg. run
+    from a source tree, where its modules are recorded as build inputs.
+
+    :rtype: str
+    """
+    try:
+        return metadata.version(pkg_name)
+    except Exception:
+        return None
+
+
+def build_key(src, path, instance_name, minify=False):
+    """Cache key of a build record, identifying an export and the settings
+    it is made with. Configurations are read before the script is run,
+    changes made by the script are covered by its content hash.
+
+    :param src: Resolved path to the Python script declaring the diagram
+    :type src: pathlib.Path
+    :param path: Resolved export path
+    :type path: pathlib.Path
+    :param instance_name: Name of the diagram instance in 'src'
+    :type instance_name: str
+    :param minify: Minify SVG markup, defaults to False
+    :type minify: bool, optional
+    :return: sha256 hex digest
+    :rtype: str
+    """
+    # Configurations, excluding those that do not affect output
+    settings = {
+        name: value
+        for name, value in vars(config).items()
+        if isinstance(value, dict)
+        and not name.startswith("_")
+        and name not in ("cache", "remote")
+    }
+    key = repr([str(src), str(path), instance_name, minify, pinout_version(), settings])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def build_inputs(src, components, reads):
+    """Local files an export depends on: the script, modules that are not
+    installed packages, stylesheets, images, and data files read by the
+    script.
+
+    :param src: Resolved path to the Python script declaring the diagram
+    :type src: pathlib.Path
+    :param components: Image and StyleSheet components of the diagram
+    :type components: dict
+    :param reads: Files opened for reading by the script (see record_reads)
+    :type reads: set
+    :return: Content hash of each file, None if the diagram includes remote images or 'reads' is None
+    :rtype: dict
+    """
+    if reads is None:
+        # Files read by the script are unknown, always rebuild
+        return None
+    paths = {src}
+    prefixes = {sys.prefix, sys.base_prefix, sys.exec_prefix}
+    if config.cache["dir"]:
+        # Cached content is keyed by its own hash
+        prefixes.add(os.path.abspath(config.cache["dir"]))
+    prefixes = tuple(prefixes)
+    for module in list(sys.modules.values()):
+        filename = getattr(module, "__file__", None)
+        if filename and filename.endswith(".py") and not filename.startswith(prefixes):
+            paths.add(Path(filename).resolve())
+    for filename in reads:
+        # Bytecode follows the modules it is compiled from
+        if not filename.endswith(".pyc") and not filename.startswith(prefixes):
+            paths.add(Path(filename).resolve())
+    for img in components[core.Image]:
+        while isinstance(img.src, core.Image):
+            img = img.src
+        if img.url is not None:
+            # Remote content can change unseen, always rebuild
+            return None
+        paths.add(Path(img.src).resolve())
+    for css in components[core.StyleSheet]:
+        paths.add(css.src.resolve())
+    try:
+        return {str(path): image_tools.file_digest(path) for path in paths}
+    except OSError:
+        return None
+
+
+def restore_build(key, path):
+    """Restore an export from its build record if its inputs are unchanged.
+
+    :param key: Cache key of the build record (see build_key)
+    :type key: str
+    :param path: Resolved export path
+    :type path: pathlib.Path
+    :return: True if 'path' is up to date
+    :rtype: bool
+    """
+    record = build_records.get(key)
+    if record is None:
+        return False
+    record = json.loads(record)
+    try:
+        for input_path, digest in record["inputs"].items():
+            if image_tools.file_digest(input_path) != digest:
+                return False
+        if image_tools.file_digest(path) == record["output"]:
+            return True
+    except OSError:
+        # Missing input or export
+        pass
+    data = build_artifacts.get(record["output"])
+    if data is None:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def record_build(key, path, inputs):
+    """Record an export, its inputs and output.
+
+    :param key: Cache key of the build record (see build_key)
+    :type key: str
+    :param path: Resolved export path
+    :type path: pathlib.Path
+    :param inputs: Content hash of each input file (see build_inputs)
+    :type inputs: dict
+    """
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    build_artifacts.set(digest, data)
+    record = {"inputs": inputs, "output": digest}
+    build_records.set(key, json.dumps(record).encode("utf-8"))
+
+
+def write_svg(diagram, fp, minify=False):
+    """Write SVG markup of a diagram to a file object.
+
+    Minified markup is rendered in compact mode (see config.output) with
+    whitespace collapsed and numbers rounded.
+
+    :param diagram: Diagram instance
+    :type diagram: Diagram
+    :param fp: Writable object
+    :type fp: file object
+    :param minify: Minify markup, defaults to False
+    :type minify: bool, optional
+    """
+    if not minify:
+        diagram.write(fp)
+        return
+    compact = config.output["compact"]
+    config.output["compact"] = True
+    try:
+        diagram.write(fp, minify=True)
+    finally:
+        config.output["compact"] = compact
+
+
+def export_diagram(
+    src, dest, instance_name="diagram", overwrite=False, minify=False, force=False
+):
+    """Export a diagram from a Python script.
+
+    SVG markup is written to file in chunks, the complete document is not
+    held in memory. .svgz files are compressed as they are written. Multiple
+    destinations can be exported from a single load of the script. Other
+    formats share a single render of the diagram.
+
+    Overwritten files are skipped if the script, the local modules it
+    imports, the files it reads, its stylesheets, and its images are
+    unchanged since the file was exported. A file modified or deleted since is restored from the
+    build cache where possible (see config.cache).
+
+    :param src: Path to the Python script declaring the diagram
+    :type src: str
+    :param dest: Export path, its suffix selects the format. Alternatively a writable object that SVG markup is streamed into. A list exports each destination.
+    :type dest: str, file object, or list
+    :param instance_name: Name of the diagram instance in 'src', defaults to "diagram"
+    :type instance_name: str, optional
+    :param overwrite: Overwrite an existing file, defaults to False
+    :type overwrite: bool, optional
+    :param minify: Minify SVG markup (see write_svg), defaults to False
+    :type minify: bool, optional
+    :param force: Export files with unchanged inputs, defaults to False
+    :type force: bool, optional
+    :return: Destinations that failed to export paired with their error
+    :rtype: list
+    """
+    # Remote images are fetched (or revalidated) at most once per export
+    image_tools.fetcher.expire()
 
     # Save CWD and return to it and end of function
     # incase multiple diagrams are being built from a script
     init_dir = Path.cwd()
 
-    # Save dest for consistent printing at end
-    raw_dest = dest
-
-    # Create 'dest' folder(s) and file - file must exist for Path.resolve() to function as expected.
-    dest = Path(dest)
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    if not overwrite:
-        dest = unique_filepath(dest)
-    dest.touch(exist_ok=True)
-    # Convert 'dest' to absolute so CWD can be changed without affecting 'dest'.
-    dest = dest.resolve()
+    if isinstance(dest, (str, os.PathLike)) or hasattr(dest, "write"):
+        dest = [dest]
+    src = Path(src).resolve()
+
+    # Pair each destination with the path it is exported to, and the key of
+    # its build record. Writable objects are streamed SVG markup with links
+    # relative to the current working directory, and are not recorded.
+    exports = []
+    for raw_dest in dest:
+        if hasattr(raw_dest, "write"):
+            exports.append((raw_dest, init_dir / "stream.svg", None))
+            continue
+        # Create 'dest' folder(s) and file - file must exist for Path.resolve() to function as expected.
+        path = Path(raw_dest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not overwrite:
+            path = unique_filepath(path)
+        path.touch(exist_ok=True)
+        # Convert 'dest' to absolute so CWD can be changed without affecting 'dest'.
+        path = path.resolve()
+        key = build_key(src, path, instance_name, minify)
+        if overwrite and not force and restore_build(key, path):
+            print(f"'{raw_dest}' is up to date.")
+            continue
+        exports.append((raw_dest, path, key))
+
+    if not exports:
+        return []
 
     # Change CWD to folder 'src' module is located.
     # This allows pinout.manager to be invoked from any location
     # but keeps paths in the src script relative to that script.
-    src = Path(src)
     os.chdir(src.parent)
     sys.path.append("")
 
-    diagram = get_diagram_instance(src, instance_name)
+    with record_reads() as reads:
+        diagram = get_diagram_instance(src, instance_name)
+    components = diagram.find_children_by_types(diagram, core.Image, core.StyleSheet)
+
+    # Linked media, following image references
+    images = []
+    for img in components[core.Image]:
+        while isinstance(img.src, core.Image):
+            img = img.src
+        if not img.embed and img.url is None and not img.src.is_absolute():
+            images.append(img)
+    stylesheets = [
+        css
+        for css in components[core.StyleSheet]
+        if not css.embed and not css.src.is_absolute()
+    ]
+    linked = {media: media.src for media in images + stylesheets}
+    inputs = build_inputs(src, components, reads)
+
+    # Export SVG files first, they are rendered with linked media
+    exports.sort(key=lambda export: export[1].suffix not in SVG_FORMATS)
+    converted = None
+    failures = []
+
+    for raw_dest, path, key in exports:
+        try:
+            if path.suffix in SVG_FORMATS:
+                # Update relative linked media to be relative to destination
+                for media, media_src in linked.items():
+                    media.src = os.path.relpath(
+                        Path.cwd().joinpath(media_src),
+                        Path.cwd().joinpath(path.parent),
+                    )
+
+                if hasattr(raw_dest, "write"):
+                    write_svg(diagram, raw_dest, minify)
+                elif path.suffix == ".svgz":
+                    # A fixed mtime keeps output identical between exports
+                    with gzip.GzipFile(path, "wb", mtime=0) as f:
+                        write_svg(diagram, f, minify)
+                else:
+                    with path.open("w") as f:
+                        write_svg(diagram, f, minify)
+
+            elif path.suffix in CAIROSVG_FORMATS:
+                if converted is None:
+                    # Embed styles - required for cairosvg to render correctly
+                    for media, media_src in linked.items():
+                        media.src = media_src
+                    for css in components[core.StyleSheet]:
+                        css.embed = True
+                    converted = diagram.render().encode("utf-8")
+
+                converter = getattr(cairosvg, CAIROSVG_FORMATS[path.suffix])
+                converter(bytestring=converted, write_to=path.as_posix())
+
+            if overwrite and inputs is not None and key is not None:
+                record_build(key, path, inputs)
+            print(f"'{raw_dest}' exported successfully.")
+
+        except Exception as e:
+            print(f"The export falied! Error: {e}")
+            failures.append((raw_dest, e))
 
-    # Prepare linked media depending on output
-    if dest.suffix == ".svg":
-        # Update relative image.src to be relative to destination
-        images = diagram.find_children_by_type(diagram, core.Image)
-        for img in images:
-            # Follow image references
-            while isinstance(img.src, core.Image):
-                img = img.src
-
-            if not img.embed and not img.src.is_absolute():
-                img.src = os.path.relpath(
-                    Path.cwd().joinpath(img.src), Path.cwd().joinpath(dest.parent)
-                )
+    # Return the CWD to the initial directory
+    os.chdir(init_dir)
+    image_tools.flush_caches()
+    return failures
 
-        # Update relative stylesheet.src to be relative to destination.
-        stylesheets = diagram.find_children_by_type(diagram, core.StyleSheet)
-        for css in stylesheets:
-            if not css.embed and not css.src.is_absolute():
-                css.src = os.path.relpath(
-                    Path.cwd().joinpath(css.src), Path.cwd().joinpath(dest.parent)
-                )
-    else:
-        # Embed styles - required for cairosvg to render correctly
-        stylesheets = diagram.find_children_by_type(diagram, core.StyleSheet)
-        for css in stylesheets:
-            css.embed = True
 
-    # Render final SVG file
-    try:
-        if dest.suffix == ".svg":
-            dest.write_text(diagram.render())
+def split_export_args(args):
+    """Separate command-line export arguments into script, destinations, and instance name.
+
+    Arguments following the script path with a suffix are export destinations,
+    an argument without a suffix is the diagram instance name.
 
-        elif dest.suffix == ".png":
-            cairosvg.svg2png(bytestring=diagram.render(), write_to=dest.as_posix())
+    :param args: Arguments supplied to --export
+    :type args: list
+    :return: Script path, export destinations, and instance name
+    :rtype: tuple
+    """
+    src, *args = args
+    dest = [arg for arg in args if Path(arg).suffix]
+    names = [arg for arg in args if not Path(arg).suffix]
+    return src, dest, (names or ["diagram"])[-1]
 
-        elif dest.suffix == ".pdf":
-            cairosvg.svg2pdf(bytestring=diagram.render(), write_to=dest.as_posix())
 
-        elif dest.suffix == ".ps":
-            cairosvg.svg2ps(bytestring=diagram.render(), write_to=dest.as_posix())
+BatchResult = collections.namedtuple(
+    "BatchResult", ("src", "dest", "instance_name", "seconds", "error")
+)
 
-        print(f"'{raw_dest}' exported successfully.")
 
-    except Exception as e:
-        print(f"The export falied! Error: {e}")
+def batch_jobs(source, suffixes=(".svg",)):
+    """Read export jobs from a manifest file or a glob pattern.
 
-    # Return the CWD to the initial directory
-    os.chdir(init_dir)
+    Each manifest line follows the --export arguments: a script path, one or
+    more destinations, and an optional instance name. Blank lines and lines
+    starting with '#' are ignored. Paths containing spaces are quoted, as on a
+    command line. Relative paths are relative to the manifest.
+    Scripts matched by a glob pattern are exported alongside the script, in
+    each format of 'suffixes'.
+
+    :param source: Path to a manifest file or glob pattern of scripts
+    :type source: str
+    :param suffixes: Export formats of globbed scripts, defaults to (".svg",)
+    :type suffixes: tuple, optional
+    :return: Jobs of absolute script path, destinations, and instance name
+    :rtype: list
+    """
+    jobs = []
+    manifest = Path(source)
+    if manifest.is_file() and manifest.suffix != ".py":
+        for line in manifest.read_text().splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            src, dest, instance_name = split_export_args(shlex.split(line))
+            jobs.append(
+                (
+                    (manifest.parent / src).resolve(),
+                    [(manifest.parent / d).resolve() for d in dest],
+                    instance_name,
+                )
+            )
+    else:
+        for src in sorted(glob.glob(source, recursive=True)):
+            src = Path(src).resolve()
+            jobs.append((src, [src.with_suffix(s) for s in suffixes], "diagram"))
+    return jobs
+
+
+def _batch_export_job(job, overwrite, minify=False, force=False):
+    """Export a single batch job in a worker process.
+
+    Each job starts from the same working directory and sys.path, and modules
+    imported by the script are unloaded afterwards, so scripts sharing module
+    names (eg. 'data.py') do not interfere. Configurations amended by the
+    script are restored.
+    """
+    src, dest, instance_name = job
+    init_dir = Path.cwd()
+    init_path = list(sys.path)
+    init_modules = set(sys.modules)
+    init_config = {
+        name: copy.deepcopy(value)
+        for name, value in vars(config).items()
+        if isinstance(value, dict) and not name.startswith("_")
+    }
+    start = time.perf_counter()
+    try:
+        failures = export_diagram(
+            src, dest, instance_name, overwrite=overwrite, minify=minify, force=force
+        )
+        error = "; ".join(f"'{d}': {e}" for d, e in failures) or None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        os.chdir(init_dir)
+        sys.path[:] = init_path
+        for name, value in init_config.items():
+            setattr(config, name, value)
+        # Unload modules imported by the script, installed packages are kept
+        prefixes = tuple({sys.prefix, sys.base_prefix, sys.exec_prefix})
+        for name in set(sys.modules) - init_modules:
+            filename = getattr(sys.modules[name], "__file__", None)
+            if filename and not filename.startswith(prefixes):
+                del sys.modules[name]
+    return BatchResult(src, dest, instance_name, time.perf_counter() - start, error)
+
+
+def batch_export(jobs, processes=None, overwrite=False, minify=False, force=False):
+    """Export many diagram scripts in parallel.
+
+    Jobs run in a pool of worker processes as exporting changes the working
+    directory, which is process wide.
+
+    :param jobs: Script path, destinations, and instance name of each export
+    :type jobs: iterable
+    :param processes: Number of worker processes, defaults to the CPU count
+    :type processes: int, optional
+    :param overwrite: Overwrite existing files, defaults to False
+    :type overwrite: bool, optional
+    :param minify: Minify SVG markup (see write_svg), defaults to False
+    :type minify: bool, optional
+    :param force: Export files with unchanged inputs, defaults to False
+    :type force: bool, optional
+    :return: Result of each job in completion order
+    :rtype: list of BatchResult
+    """
+    results = []
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_batch_export_job, job, overwrite, minify, force)
+            for job in jobs
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            status = "failed" if result.error else "ok"
+            print(f"[{status}] {result.src} ({result.seconds:.2f}s)")
+            if result.error:
+                print(f"    {result.error}")
+            results.append(result)
+
+    failed = sum(1 for result in results if result.error)
+    print(
+        f"Batch export: {len(results) - failed} succeeded, {failed} failed "
+        f"in {time.perf_counter() - start:.2f}s."
+    )
+    return results
 
 
 def create_kicad_lib(dest=".", config_file=None, version=None):
@@ -336,7 +775,22 @@ def __main__():
         "--export",
         nargs="+",
         action="store",
-        help="example usage: python -m pinout.manager -e <module name> <export filename> [<instance name>]\n <instance name> defaults to 'diagram'",
+        help="example usage: python -m pinout.manager -e <module name> <export filename> [<export filename> ...] [<instance name>]\n <instance name> defaults to 'diagram'",
+    )
+
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        action="store",
+        help="Export many diagrams in parallel. example usage: python -m pinout.manager --batch <manifest file or glob pattern> [<export suffix> ...]\n Manifest lines follow --export arguments. Globbed scripts are exported alongside the script, suffix defaults to '.svg'",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        action="store",
+        type=int,
+        help="Number of worker processes used by --batch, defaults to the CPU count.",
     )
 
     parser.add_argument(
@@ -346,6 +800,30 @@ def __main__():
         help="example usage: python -m pinout.manager --css <module name> <export filename> [<instance name>]\n <instance name> defaults to 'diagram'",
     )
 
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use remote images already cached, never connect to a server.",
+    )
+
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Export compact SVG markup with whitespace collapsed and numbers rounded.",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Export files even if the diagram, its modules, stylesheets, and images are unchanged.",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        action="store",
+        help="Folder caches persist in between runs, making exports incremental (see config.cache).",
+    )
+
     parser.add_argument(
         "-o",
         "--overwrite",
@@ -360,11 +838,41 @@ def __main__():
     )
 
     args = parser.parse_args()
+    if args.offline:
+        from pinout import config
+
+        config.remote["offline"] = True
+    if args.cache_dir:
+        from pinout import config
+
+        config.cache["dir"] = Path(args.cache_dir).resolve()
+
     if args.duplicate:
         duplicate(args.duplicate, args.overwrite)
 
     if args.export:
-        export_diagram(*args.export, overwrite=args.overwrite)
+        src, dest, instance_name = split_export_args(args.export)
+        export_diagram(
+            src,
+            dest,
+            instance_name,
+            overwrite=args.overwrite,
+            minify=args.minify,
+            force=args.force,
+        )
+
+    if args.batch:
+        source, *suffixes = args.batch
+        jobs = batch_jobs(source, tuple(suffixes) or (".svg",))
+        results = batch_export(
+            jobs,
+            processes=args.jobs,
+            overwrite=args.overwrite,
+            minify=args.minify,
+            force=args.force,
+        )
+        if any(result.error for result in results):
+            sys.exit(1)
 
     if args.css:
         create_stylesheet(*args.css, overwrite=args.overwrite)
@@ -192,3 +192,52 @@ kicad_5_footprints = {
         "hide_fp_text_user": True,
     },
 }
+
+
+################################
+#
+# Cache settings
+#
+################################
+cache = {
+    # Folder where caches persist between runs. None keeps caches in memory only.
+    "dir": None,
+    # Maximum number of images with dimensions held in memory
+    "image_info_size": 256,
+    # Maximum number of encoded images, for embedding, held in memory
+    "embed_size": 64,
+    # Maximum number of encoded images, and of remote images, kept in the
+    # cache folder
+    "embed_files": 256,
+    # Maximum number of exports recorded, and exported files kept, in the
+    # cache folder (see manager.export_diagram)
+    "build_size": 256,
+}
+
+
+################################
+#
+# Remote images
+#
+################################
+remote = {
+    # Seconds to wait for a server before fetching an image fails
+    "timeout": 10,
+    # Only use remote images held in the cache (see cache["dir"]), never connect to a server
+    "offline": False,
+}
+
+
+################################
+#
+# Output
+#
+################################
+output = {
+    # Omit identity transforms and redundant attributes from component tags,
+    # shape-rendering is set once on the root <svg> tag
+    "compact": False,
+    # Decimal places of coordinates and dimensions, None writes numbers in
+    # full (or to 3 places in minified output, see manager --minify)
+    "precision": None,
+}
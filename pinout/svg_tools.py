@@ -0,0 +1,161 @@
+import functools
+import re
+from pinout import config
+
+# Attributes holding numbers, or lists of numbers, rounded by minify()
+NUMERIC_ATTRS = (
+    "cx",
+    "cy",
+    "d",
+    "font-size",
+    "height",
+    "points",
+    "r",
+    "rx",
+    "ry",
+    "stroke-width",
+    "transform",
+    "viewBox",
+    "width",
+    "x",
+    "x1",
+    "x2",
+    "y",
+    "y1",
+    "y2",
+)
+
+TAG = re.compile(r"(<[^>]*>)")
+WHITESPACE = re.compile(r"\s+")
+ATTR_QUOTES = re.compile(r'\s*=\s*"\s*([^"]*?)\s*"')
+TAG_END = re.compile(r"\s*(/?>)$")
+NUMERIC_ATTR = re.compile(r'(\s(?:{})=")([^"]*)"'.format("|".join(NUMERIC_ATTRS)))
+NUMBER = re.compile(r"-?(?:\d*\.\d+(?:[eE][-+]?\d+)?|\d+[eE][-+]?\d+)")
+
+# Decimal places of minified numbers when config.output["precision"] is None
+MINIFY_DECIMALS = 3
+
+
+@functools.lru_cache(maxsize=None)
+def number_formatter(precision):
+    """Function formatting numbers rounded to 'precision' decimal places,
+    without trailing zeros. Fixed point formatting is quicker than the
+    shortest round-tripping repr() of a float. Values other than numbers,
+    eg. "100%" or "auto", are formatted with str().
+
+    :param precision: Decimal places, None formats numbers with str()
+    :type precision: int
+    :return: Formatting function, accepting a number and returning a string
+    :rtype: function
+    """
+    if precision is None:
+        return str
+    spec = f".{precision}f"
+
+    def format_number(value):
+        if not isinstance(value, (int, float)):
+            return str(value)
+        text = format(value, spec)
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+
+    return format_number
+
+
+def formatter():
+    """Number formatter of coordinates and dimensions in SVG markup, set by
+    config.output["precision"].
+
+    :return: Formatting function, accepting a number and returning a string
+    :rtype: function
+    """
+    return number_formatter(config.output["precision"])
+
+
+def format_number(value, decimals):
+    """Shortest representation of a number rounded to 'decimals' places.
+
+    :param value: Number to format
+    :type value: float
+    :param decimals: Decimal places
+    :type decimals: int
+    :return: Formatted number, without trailing zeros
+    :rtype: str
+    """
+    return number_formatter(decimals)(value)
+
+
+def minify_tag(tag, decimals):
+    """Minify a single tag.
+
+    :param tag: Markup of a tag, from '<' to '>'
+    :type tag: str
+    :param decimals: Decimal places of numeric attributes
+    :type decimals: int
+    :return: Minified tag
+    :rtype: str
+    """
+    tag = WHITESPACE.sub(" ", tag)
+    tag = ATTR_QUOTES.sub(r'="\1"', tag)
+    tag = TAG_END.sub(r"\1", tag)
+    fmt = number_formatter(decimals)
+    return NUMERIC_ATTR.sub(
+        lambda m: m.group(1)
+        + NUMBER.sub(lambda n: fmt(float(n.group(0))), m.group(2))
+        + '"',
+        tag,
+    )
+
+
+def minify_markup(markup, decimals):
+    """Collapse whitespace and round numeric attributes of SVG markup.
+
+    Whitespace between tags is removed, whitespace in text is collapsed to a
+    single space (which SVG renders identically).
+
+    :param markup: SVG markup of complete tags
+    :type markup: str
+    :param decimals: Decimal places of numeric attributes
+    :type decimals: int
+    :return: Minified markup
+    :rtype: str
+    """
+    parts = TAG.split(markup)
+    for i, part in enumerate(parts):
+        if i % 2:
+            parts[i] = minify_tag(part, decimals)
+        elif part.isspace():
+            parts[i] = ""
+        else:
+            parts[i] = WHITESPACE.sub(" ", part)
+    return "".join(parts)
+
+
+def minify(chunks, decimals=None):
+    """Minify SVG markup chunk by chunk (see minify_markup). A tag split
+    between chunks is carried to the next chunk.
+
+    :param chunks: SVG markup
+    :type chunks: iterable of strings
+    :param decimals: Decimal places of numeric attributes, defaults to config.output["precision"], or MINIFY_DECIMALS if that is None
+    :type decimals: int, optional
+    :return: Minified markup
+    :rtype: generator of strings
+    """
+    if decimals is None:
+        decimals = config.output["precision"]
+    if decimals is None:
+        decimals = MINIFY_DECIMALS
+    carry = ""
+    for chunk in chunks:
+        markup = carry + chunk
+        cut = markup.rfind("<")
+        if cut != -1 and markup.find(">", cut) == -1:
+            markup, carry = markup[:cut], markup[cut:]
+        else:
+            carry = ""
+        if markup:
+            yield minify_markup(markup, decimals)
+    if carry:
+        yield minify_markup(carry, decimals)
@@ -1,4 +1,6 @@
+import re
 from jinja2 import Environment, PackageLoader, select_autoescape
+from pinout import config, svg_tools
 
 
 env = Environment(
@@ -7,7 +9,55 @@ env = Environment(
     trim_blocks=True,
     lstrip_blocks=True,
 )
+env.globals["config"] = config
+# Numbers formatted to config.output["precision"] decimal places
+env.filters["num"] = lambda value: svg_tools.formatter()(value)
 
 
 def get(template_name):
     return env.get_template(template_name)
+
+
+def iter_render(template_name, streams=None, **context):
+    """Render a template in chunks.
+
+    Each generator in 'streams' is consumed in place of the template variable
+    of the same name. Its content is yielded as is and never joined into the
+    template output.
+
+    :param template_name: Name of the template
+    :type template_name: str
+    :param streams: Template variable names mapped to generators of strings
+    :type streams: dict, optional
+    :return: Rendered template
+    :rtype: generator of strings
+    """
+    streams = streams or {}
+    for i, part in enumerate(fragments(template_name, streams, **context)):
+        if i % 2:
+            yield from streams[part]
+        elif part:
+            yield part
+
+
+def fragments(template_name, streams, **context):
+    """Render a template split around the variables named in 'streams'.
+
+    Static markup and variable names alternate in the returned tuple, static
+    markup at even indices.
+
+    :param template_name: Name of the template
+    :type template_name: str
+    :param streams: Template variable names
+    :type streams: iterable
+    :return: Rendered template fragments
+    :rtype: tuple
+    """
+    markers = {key: f"\0{key}\0" for key in streams}
+    markup = get(template_name).render(**context, **markers)
+    parts = re.split("\0(\\w+)\0", markup)
+    # Fragments are cached by components, variable names are shared rather
+    # than copied into each
+    names = {key: key for key in streams}
+    parts[1::2] = [names[name] for name in parts[1::2]]
+    return tuple(parts)
@@ -0,0 +1,135 @@
+import functools
+import math
+from collections import namedtuple
+
+
+@functools.lru_cache(maxsize=360)
+def trig(degrees):
+    """Cosine and sine of an angle, calculated once per angle.
+
+    :param degrees: Angle in degrees
+    :type degrees: float
+    :return: Cosine and sine of the angle
+    :rtype: tuple
+    """
+    radians = math.radians(degrees)
+    return math.cos(radians), math.sin(radians)
+
+
+class Transform(namedtuple("Transform", ("a", "b", "c", "d", "e", "f"))):
+    """2D affine transform. Points are transformed as:
+
+    x' = a * x + c * y + e
+    y' = b * x + d * y + f
+
+    Values follow the order of the SVG 'matrix(a b c d e f)' transform
+    function. Transforms are composed with the '@' operator, the right hand
+    transform is applied first.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def identity(cls):
+        return cls(1, 0, 0, 1, 0, 0)
+
+    @classmethod
+    def translation(cls, x, y):
+        return cls(1, 0, 0, 1, x, y)
+
+    @classmethod
+    def scaling(cls, x, y):
+        return cls(x, 0, 0, y, 0, 0)
+
+    @classmethod
+    def rotation(cls, degrees, origin=(0, 0)):
+        """Clockwise rotation (in SVG coordinate space) around 'origin'.
+
+        :param degrees: Angle of rotation
+        :type degrees: float
+        :param origin: Centre of rotation, defaults to (0, 0)
+        :type origin: tuple, optional
+        :rtype: Transform
+        """
+        cos, sin = trig(degrees)
+        ox, oy = origin
+        return cls(
+            cos, sin, -sin, cos, ox - ox * cos + oy * sin, oy - ox * sin - oy * cos
+        )
+
+    @classmethod
+    def skew(cls, x=0, y=0):
+        """Skew along the x and/or y axis, as the SVG 'skewX' and 'skewY'
+        transform functions.
+
+        :param x: Angle of skew along the x axis in degrees, defaults to 0
+        :type x: float, optional
+        :param y: Angle of skew along the y axis in degrees, defaults to 0
+        :type y: float, optional
+        :rtype: Transform
+        """
+        return cls(1, math.tan(math.radians(y)), math.tan(math.radians(x)), 1, 0, 0)
+
+    def inverse(self):
+        """Transform reversing this one.
+
+        :rtype: Transform
+        """
+        a, b, c, d, e, f = self
+        det = a * d - b * c
+        return Transform(
+            d / det,
+            -b / det,
+            -c / det,
+            a / det,
+            (c * f - d * e) / det,
+            (b * e - a * f) / det,
+        )
+
+    def __matmul__(self, other):
+        a, b, c, d, e, f = self
+        oa, ob, oc, od, oe, of = other
+        return Transform(
+            a * oa + c * ob,
+            b * oa + d * ob,
+            a * oc + c * od,
+            b * oc + d * od,
+            a * oe + c * of + e,
+            b * oe + d * of + f,
+        )
+
+    def apply(self, x, y):
+        """Transform a single point.
+
+        :return: Transformed x and y
+        :rtype: tuple
+        """
+        return (
+            x * self.a + y * self.c + self.e,
+            x * self.b + y * self.d + self.f,
+        )
+
+    def apply_all(self, points):
+        """Transform a batch of points.
+
+        :param points: (x, y) pairs
+        :type points: iterable
+        :return: Transformed points
+        :rtype: list of tuples
+        """
+        a, b, c, d, e, f = self
+        return [(x * a + y * c + e, x * b + y * d + f) for x, y in points]
+
+    def bounds(self, coords):
+        """Axis aligned bounds of a transformed rectangle.
+
+        :param coords: Rectangle corners (x1, y1, x2, y2)
+        :type coords: tuple
+        :return: Bounds of the transformed rectangle (x1, y1, x2, y2)
+        :rtype: tuple
+        """
+        x1, y1, x2, y2 = coords
+        points = self.apply_all(((x1, y1), (x2, y1), (x1, y2), (x2, y2)))
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        return min(xs), min(ys), max(xs), max(ys)
@@ -0,0 +1,360 @@
+import gzip
+import io
+import pytest
+import re
+from pinout import config
+from pinout.components.annotation import AnnotationLabel
+from pinout.components.layout import Diagram
+from pinout.components import pinlabel
+from pinout.components.pinlabel import PinLabel, PinLabelGroup
+from pinout.core import (
+    BoundingCoords,
+    Circle,
+    ClipPath,
+    Coords,
+    Group,
+    Layout,
+    Path,
+    Rect,
+    StyleSheet,
+    Text,
+    Use,
+)
+
+
+def test_bounding_coords_cached():
+    group = Group()
+    group.add(Rect(width=10, height=10))
+    coords = group.bounding_coords()
+    assert group.bounding_coords() is coords
+
+
+def test_bounding_coords_invalidated_by_descendant():
+    outer = Group()
+    inner = outer.add(Group(x=5))
+    rect = inner.add(Rect(width=10, height=10))
+    assert outer.bounding_coords() == BoundingCoords(5, 0, 15, 10)
+
+    rect.x = 10
+    assert outer.bounding_coords() == BoundingCoords(15, 0, 25, 10)
+
+    inner.scale = Coords(2, 2)
+    assert outer.bounding_coords() == BoundingCoords(25, 0, 45, 20)
+
+    inner.add(Rect(y=-10, width=1, height=1))
+    assert outer.bounding_coords() == BoundingCoords(5, -20, 45, 20)
+
+
+def test_invalidate_stops_at_invalidated_ancestor(monkeypatch):
+    outer = Group()
+    inner = outer.add(Group())
+    rect = inner.add(Rect(width=10, height=10))
+    coords = outer.bounding_coords()
+
+    # Attributes other than geometry leave bounding coords cached
+    rect.tag = "a"
+    assert outer.bounding_coords() is coords
+
+    invalidated = []
+    invalidate = Group.invalidate
+    monkeypatch.setattr(
+        Group, "invalidate", lambda self: invalidated.append(self) or invalidate(self)
+    )
+    rect.x = 1
+    assert invalidated == [inner, outer]
+    rect.x = 2
+    assert invalidated == [inner, outer]
+    assert outer.bounding_coords() == BoundingCoords(2, 0, 12, 10)
+
+
+def test_bounding_coords_invalidated_by_shared_clip():
+    clip = ClipPath(children=Rect(width=10, height=10))
+    rect_01 = Rect(width=50, height=50, clip=clip)
+    rect_02 = Rect(width=50, height=50, clip=clip)
+    assert rect_01.width == rect_02.width == 10
+
+    clip.children[0].width = 20
+    assert rect_01.bounding_coords().x2 == rect_02.bounding_coords().x2 == 20
+
+
+def test_bounding_coords_follow_rendered_transform():
+    # Scaled after rotating, as the SVG transform attribute applies them
+    group = Group(x=10, scale=(2, 1), rotate=90)
+    rect = group.add(Rect(width=10, height=5))
+    assert group.bounding_coords() == pytest.approx((0, 0, 10, 10))
+    world = group.world_transform.bounds(rect.bounding_coords())
+    assert group.bounding_coords() == pytest.approx(world)
+
+
+def test_find_children_by_types_index_matches_traversal():
+    diagram = Diagram(100, 100)
+    diagram.add_stylesheet("styles.css")
+    # Subtree is built before being added to the diagram
+    group = Group()
+    label = group.add(PinLabel("A"))
+    text = group.add(Text("B"))
+    diagram.add(group)
+
+    results = diagram.find_children_by_types(diagram, PinLabel, Group, StyleSheet)
+    assert results[PinLabel] == [label]
+    assert set(results[Group]) == {group, label}
+    assert len(results[StyleSheet]) == 1
+    assert diagram.find_children_by_type(diagram, Text) == [text]
+
+    # A component within the tree is searched by traversal
+    assert Layout.find_children_by_types(group, PinLabel, Text) == {
+        PinLabel: [label],
+        Text: [text],
+    }
+
+
+def test_index_follows_replaced_children():
+    diagram = Diagram(100, 100)
+    group = diagram.add(Group())
+    removed = group.add(Rect(tag="old"))
+    group.children = [Rect(tag="new")]
+    assert diagram.find_children_by_type(diagram, Rect) == group.children
+    assert removed.parent is None
+
+
+def test_write_streams_render_output():
+    def build():
+        diagram = Diagram(100, 100)
+        diagram.add_stylesheet("styles.css")
+        group = diagram.add(Group(x=10, y=10))
+        group.add(Rect(width=10, height=10, clip=Rect(width=5, height=5)))
+        group.add(PinLabel("A"))
+        return diagram
+
+    # Ids are scoped per diagram, identically built diagrams match
+    markup = build().render()
+
+    diagram = build()
+    assert len(list(diagram.iter_render())) > 1
+
+    text_stream = io.StringIO()
+    build().write(text_stream)
+    assert text_stream.getvalue() == markup
+
+    byte_stream = io.BytesIO()
+    with gzip.GzipFile(fileobj=byte_stream, mode="wb") as f:
+        build().write(f)
+    assert gzip.decompress(byte_stream.getvalue()).decode("utf-8") == markup
+
+
+@pytest.mark.parametrize(
+    "component, template",
+    [
+        (Rect(x=1, y=2, width=3, height=4, corner_radius=1, tag="a b"), "rect.svg"),
+        (Rect(width=3, height=4, clip=Rect(width=1, height=1)), "rect.svg"),
+        (Text("content", x=1, y=2, scale=(-1, 1), rotate=90), "text.svg"),
+        (Path("M 0 0 L 10 10", tag="line"), "path.svg"),
+        (Circle(1, 2, 3.14159), "circle.svg"),
+        (Rect(x=1 / 3, width=2 / 3, height=4, corner_radius=0.25), "rect.svg"),
+        (Use(Rect(), x=5), "use.svg"),
+        (Rect(width=3, height=4, matrix=(1, 0, 0, 1, 2, 3), skewx=10), "rect.svg"),
+    ],
+)
+@pytest.mark.parametrize(
+    "compact, precision", [(False, None), (True, None), (False, 1)]
+)
+def test_serializer_matches_template(
+    monkeypatch, component, template, compact, precision
+):
+    monkeypatch.setitem(config.output, "compact", compact)
+    monkeypatch.setitem(config.output, "precision", precision)
+
+    def normalise(data):
+        data = re.sub(r"\s+", " ", data)
+        return re.sub(r'\s*([<>="])\s*', r"\1", data)
+
+    component.template = None
+    markup = component.render()
+    component.template = template
+    assert normalise(markup) == normalise(component.render())
+
+
+def test_markup_follows_output_settings(monkeypatch):
+    rect = Rect(width=1 / 3, height=4)
+    markup = rect.render()
+    monkeypatch.setitem(config.output, "precision", 2)
+    assert rect.render() != markup
+    assert 'width="0.33"' in rect.render()
+
+
+def test_render_is_idempotent():
+    diagram = Diagram(100, 100)
+    diagram.add_stylesheet("styles.css")
+    group = diagram.add(Group(x=10, y=10, clip=Rect(width=50, height=50)))
+    label = group.add(PinLabel("A"))
+
+    markup = diagram.render()
+    children = list(label.children)
+    assert diagram.render() == markup
+    assert label.children == children
+    assert len(group.defs) == 1
+
+    # Modified components are rebuilt on the next render
+    label.content = "B"
+    markup = diagram.render()
+    assert ">B</text>" in markup and ">A</text>" not in markup
+    assert len(label.children) == len(children)
+    assert diagram.find_children_by_type(diagram, Text) == [label.children[-2]]
+
+
+def test_materialise_rebuilds_modified_build_inputs(monkeypatch):
+    diagram = Diagram(100, 100)
+    diagram.add_stylesheet("styles.css")
+    labels = [diagram.add(PinLabel(c, y=i * 10)) for i, c in enumerate("AB")]
+    diagram.render()
+    generated = [list(label.children) for label in labels]
+
+    # Unmodified subtrees are skipped
+    visited = []
+    build_key = PinLabel.build_key
+    monkeypatch.setattr(
+        PinLabel, "build_key", lambda self: visited.append(self) or build_key(self)
+    )
+    diagram.render()
+    assert visited == []
+
+    # Attributes the build does not read leave generated components in place
+    labels[0].tag = "other"
+    assert 'class="other"' in diagram.render()
+    assert visited == [labels[0]]
+    assert [label.children for label in labels] == generated
+
+    # Build inputs, including those of descendants, rebuild the component
+    labels[1].body.width = 50
+    diagram.render()
+    assert labels[0].children == generated[0]
+    assert labels[1].children != generated[1]
+    assert len(labels[1].children) == len(generated[1])
+
+
+def test_components_are_slotted():
+    diagram = Diagram(100, 100)
+    diagram.add_stylesheet("styles.css")
+    group = diagram.add(Group(clip=Rect(width=50, height=50)))
+    label = group.add(PinLabel("A"))
+    diagram.render()
+
+    # Attributes set while building and rendering are held in slots
+    components = [group, label, label.body, label.leaderline] + label.children
+    assert components and all(vars(c) == {} for c in components)
+
+    # Unslotted attributes are still accepted
+    label.body.template = "rect.svg"
+    assert vars(label.body) == {"template": "rect.svg"}
+
+
+def test_config_shared_copy_on_write():
+    defaults = config.pinlabel["body"]
+    label = PinLabel("A")
+    assert label.config["body"] == defaults
+
+    # Shared nested dicts are read-only
+    with pytest.raises(TypeError):
+        label.config["body"]["width"] = 123
+
+    # Instance values are layered over defaults, which are left unchanged
+    label.body = {"width": 123}
+    label.body = {"height": 45}
+    assert label.config["body"]["width"] == 123
+    assert label.config["body"]["height"] == label.body.height == 45
+    assert config.pinlabel["body"] is defaults
+    assert defaults["width"] != 123
+    assert PinLabel("B").body.width == defaults["width"]
+
+
+@pytest.mark.parametrize("scale", [(1, 1), (-1, 1), (1, -1)])
+def test_pinlabel_group_rows(scale):
+    group = PinLabelGroup(
+        x=0,
+        y=0,
+        pin_pitch=(0, 10),
+        label_start=(60, 0),
+        label_pitch=(0, 10),
+        scale=scale,
+        labels=[
+            [("A", "a", {"body": {"width": 35.5}}), ("B", "b"), ("C", "c")],
+            [],
+            [("D", "d"), ("E", "e", {"body": {"x": 5, "y": 2}})],
+        ],
+    )
+    rows = [row.children for row in group.children]
+    assert [len(row) for row in rows] == [3, 0, 2]
+    assert (rows[2][0].x, rows[2][0].y) == (0, 10)
+
+    # Labels follow the previous label in the row, as measured by its bounding-box
+    for row in rows:
+        for prev_label, label in zip(row, row[1:]):
+            assert label.x == pytest.approx(prev_label.x + prev_label.width * scale[0])
+            assert label.y == prev_label.y + prev_label.body.y * scale[1]
+            assert isinstance(label.leaderline, pinlabel.lline.Straight)
+
+
+def test_ids_scoped_per_diagram_and_referenced_only():
+    def build():
+        diagram = Diagram(100, 100, id_prefix="d")
+        diagram.add_stylesheet("styles.css")
+        clipped = diagram.add(Rect(width=10, height=10, clip=Rect(width=5, height=5)))
+        diagram.add(Use(clipped, x=20))
+        diagram.add(Rect(width=10, height=10, tag="plain"))
+        return diagram
+
+    first = build()
+    markup = first.render()
+    ids = re.findall(r'\bid="([^"]+)"', markup)
+    assert sorted(ids) == ["d1", "d2"]
+    assert 'clip-path="url(#d1)"' in markup
+    assert 'href="#d2"' in markup
+    assert (
+        '<rect class="plain" transform="translate(0 0) scale(1 1) rotate(0)" clip'
+        in markup
+    )
+
+    # Another diagram built in between does not affect ids
+    build().render()
+    assert first.render() == markup
+    assert build().render() == markup
+
+
+def test_compact_output(monkeypatch):
+    diagram = Diagram(100, 100)
+    diagram.add_stylesheet("styles.css")
+    group = diagram.add(Group(x=10, y=10))
+    group.add(Rect(width=10, height=10, clip=Rect(width=5, height=5)))
+    group.add(Text("A", rotate=90))
+    markup = diagram.render()
+
+    monkeypatch.setitem(config.output, "compact", True)
+    compact = diagram.render()
+    assert len(compact) < len(markup)
+    assert "clipPathUnits" not in compact
+    assert compact.count("shape-rendering") == 1
+    assert "scale(1 1)" not in compact
+    assert '<rect clip-path="url(#p1)" width=' in compact
+    assert '<text transform="rotate(90)">A</text>' in compact
+
+    monkeypatch.setitem(config.output, "compact", False)
+    assert diagram.render() == markup
+
+
+def test_precision(monkeypatch):
+    diagram = Diagram(100, 100)
+    diagram.add_stylesheet("styles.css")
+    diagram.add(Rect(x=1 / 3, y=2 / 3, width=10 / 3, height=1))
+    diagram.add(PinLabel("A", x=1 / 7, y=1 / 3, body={"x": 10 / 3, "y": 20 / 7}))
+    diagram.add(AnnotationLabel("B", x=1 / 3, y=1 / 7, body={"x": 10 / 3}))
+    markup = diagram.render()
+    assert "0.3333333333333333" in markup
+
+    monkeypatch.setitem(config.output, "precision", 2)
+    rounded = diagram.render()
+    numbers = re.findall(r"-?\d*\.\d+", rounded)
+    assert numbers and all(len(n.split(".")[1]) <= 2 for n in numbers)
+    assert 'L 3.33 2.86"/>' in rounded
+
+    monkeypatch.setitem(config.output, "precision", None)
+    assert diagram.render() == markup
@@ -0,0 +1,248 @@
+import http.server
+import os
+import pytest
+import threading
+from pathlib import Path
+from pinout import config, image_tools
+from pinout.core import Image
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    probed = []
+    probe_image = image_tools.probe_image
+
+    def counted(path):
+        probed.append(path)
+        return probe_image(path)
+
+    monkeypatch.setattr(image_tools, "probe_image", counted)
+    monkeypatch.setattr(image_tools, "image_info_cache", image_tools.LRUCache())
+    return probed
+
+
+def test_image_info(probes):
+    assert image_tools.image_info(RESOURCES / "200x200.png") == {
+        "format": "PNG",
+        "size": [200, 200],
+    }
+    assert image_tools.image_info(RESOURCES / "200x200.svg")["format"] == "SVG"
+
+
+def test_image_info_cached(probes, tmp_path):
+    src = tmp_path / "image.svg"
+    src.write_bytes((RESOURCES / "200x200.svg").read_bytes())
+
+    im_01 = Image(src, dpi=72)
+    im_02 = Image(src, dpi=72)
+    im_02.dpi = 96
+    assert im_01.im_size == (200, 200)
+    assert len(probes) == 1
+
+    # Modified files are probed again
+    stat = src.stat()
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    Image(src)
+    assert len(probes) == 2
+
+
+def test_lru_cache_eviction():
+    cache = image_tools.LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_persisted(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.cache, "dir", tmp_path)
+    cache = image_tools.LRUCache(filename="test.json")
+    cache.set("a", [1, 2])
+    assert not cache.path.exists()
+    image_tools.flush_caches()
+    assert image_tools.LRUCache(filename="test.json").get("a") == [1, 2]
+
+
+def test_lru_cache_merged_when_saved(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.cache, "dir", tmp_path)
+    cache_01 = image_tools.LRUCache(filename="test.json")
+    cache_02 = image_tools.LRUCache(filename="test.json")
+    cache_01.set("a", 1)
+    cache_02.set("b", 2)
+    # Each process writes its own entries, neither discards the other's
+    cache_01.flush()
+    cache_02.flush()
+    cache = image_tools.LRUCache(filename="test.json")
+    assert (cache.get("a"), cache.get("b")) == (1, 2)
+
+
+def test_content_cache_files_evicted(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.cache, "dir", tmp_path)
+    cache = image_tools.ContentCache(folder="files", maxfiles=2)
+    for i, key in enumerate("abc"):
+        cache.set(key, b"data")
+        os.utime(tmp_path / "files" / key, ns=(i, i))
+    assert sorted(path.name for path in (tmp_path / "files").iterdir()) == ["b", "c"]
+
+
+def test_image_dimensions_probed_lazily(probes):
+    image = Image(RESOURCES / "200x200.png", width=50, height=100)
+    assert probes == []
+    assert image.im_size == (200, 200)
+    assert len(probes) == 1
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG", "GIF", "BMP"])
+def test_probe_image_header(tmp_path, fmt):
+    from PIL import Image as PILImage
+
+    src = tmp_path / f"image.{fmt.lower()}"
+    PILImage.new("RGB", (123, 45)).save(src, fmt)
+    assert image_tools.probe_image(src) == {"format": fmt, "size": [123, 45]}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"\xff\xd8\xff\xe0\x00\x00",
+        b"\xff\xd8\xff\xe0\x00",
+        b"\xff\xd8\xff\xc0\x00\x11\x08",
+    ],
+)
+def test_jpeg_size_corrupt(data):
+    import io
+
+    assert image_tools.jpeg_size(io.BytesIO(data)) is None
+
+
+def test_embed_cached_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_tools, "embed_cache", image_tools.ContentCache())
+    data = (RESOURCES / "200x200.png").read_bytes()
+    src_01 = tmp_path / "a.png"
+    src_02 = tmp_path / "b.png"
+    src_01.write_bytes(data)
+    src_02.write_bytes(data)
+
+    payload = image_tools.embed_file(src_01, "png")
+    assert payload.startswith(b"data:image/png;base64,")
+    assert image_tools.embed_file(src_02, "png") is payload
+    assert image_tools.embed_data(data, "png") is payload
+
+
+def test_embed_persisted(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.cache, "dir", tmp_path)
+    image_tools.ContentCache(folder="embed").set("key", b"payload")
+    assert image_tools.ContentCache(folder="embed").get("key") == b"payload"
+
+
+def test_render_embedded_image_is_repeatable():
+    image = Image(RESOURCES / "200x200.png", embed=True)
+    markup = image.render()
+    assert "data:image/png;base64," in markup
+    assert image.src == RESOURCES / "200x200.png"
+    assert image.render() == markup
+
+
+def test_repeated_embedded_images_share_defs():
+    from pinout.components.layout import Diagram
+
+    diagram = Diagram(600, 200)
+    diagram.add_stylesheet("styles.css")
+    for x in (0, 200, 400):
+        diagram.add(Image(RESOURCES / "200x200.png", x=x, width=100, embed=True))
+    diagram.add(Image(RESOURCES / "200x200.svg", embed=True))
+
+    markup = diagram.render()
+    assert markup.count('xlink:href="data:image/png;base64,') == 1
+    assert markup.count("<use") == 3
+    assert diagram.render() == markup
+
+    diagram.add(Image(RESOURCES / "200x200.png", embed=True))
+    markup = diagram.render()
+    assert markup.count('xlink:href="data:image/png;base64,') == 1
+    assert markup.count("<use") == 4
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """Local HTTP server for RESOURCES, recording each request."""
+    requests = []
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(RESOURCES), **kwargs)
+
+        def send_head(self):
+            requests.append((self.client_address, self.path))
+            etag = f'"{self.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            return super().send_head()
+
+        def end_headers(self):
+            self.send_header("ETag", f'"{self.path}"')
+            super().end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setitem(config.cache, "dir", tmp_path)
+    monkeypatch.setattr(image_tools, "fetcher", image_tools.Fetcher())
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.requests = requests
+    yield httpd
+    image_tools.fetcher.close()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_remote_image_fetched_once(server):
+    url = f"{server.url}/200x200.png"
+    image = Image(url, embed=True)
+    assert image.im_size == (200, 200)
+    assert "data:image/png;base64," in image.render()
+
+    linked = Image(f"{server.url}/200x200.svg")
+    assert linked.im_size == (200, 200)
+    assert f'href="{server.url}/200x200.svg"' in linked.render()
+
+    # One download per URL, on a single kept-alive connection
+    assert [path for _, path in server.requests] == ["/200x200.png", "/200x200.svg"]
+    assert len({address for address, _ in server.requests}) == 1
+
+
+def test_remote_image_revalidated(server):
+    url = f"{server.url}/200x200.png"
+    data = image_tools.fetch(url)
+    image_tools.flush_caches()
+
+    # A new build in a new process revalidates the cached response
+    image_tools.fetcher = image_tools.Fetcher()
+    assert image_tools.fetch(url) == data
+    assert len(server.requests) == 2
+
+    # Offline, cached content is used and uncached content is an error
+    image_tools.fetcher = image_tools.Fetcher(offline=True)
+    assert image_tools.fetch(url) == data
+    with pytest.raises(image_tools.FetchError):
+        image_tools.fetch(f"{server.url}/200x200.svg")
+    assert len(server.requests) == 2
+
+
+def test_remote_image_missing(server):
+    with pytest.raises(image_tools.FetchError):
+        Image(f"{server.url}/missing.png")
@@ -0,0 +1,88 @@
+import os
+import zipfile
+import pytest
+from importlib import resources
+from pinout import kicad2pinout as k2p
+from pinout.core import Group, Image
+
+
+@pytest.fixture
+def kicad_6_pcb(tmp_path):
+    example = resources.files("pinout") / "resources" / "pinout_kicad_example.zip"
+    with example.open("rb") as f:
+        zipfile.ZipFile(f).extractall(tmp_path)
+    return tmp_path / "pinout_kicad_example" / "kicad_6_pcb" / "kicad_6_pcb.kicad_pcb"
+
+
+def test_kicad_parser(kicad_6_pcb):
+    parser = k2p.KiCadParser(kicad_6_pcb)
+    assert k2p.KiCadParser.version(parser) == "20211014"
+    assert parser.generator() == "pcbnew"
+    assert parser.paper() == "A4"
+    assert parser.general() == {"thickness": 1.6}
+    assert parser.layers()[32] == {
+        "canonical_name": "B.Adhes",
+        "type": "user",
+        "user_name": "B.Adhesive",
+    }
+
+    footprints = parser.footprints()
+    assert len(footprints) == 11
+    origin = footprints[0]
+    assert origin["name"] == "pinout:Origin"
+    assert origin["layer"] == "F.Cu"
+    assert origin["at"] == [parser.mm_to_dpi(110), parser.mm_to_dpi(70)]
+    assert parser.gr_text()[0].startswith("{{pinout_title}}")
+
+
+def test_pinout_parser(kicad_6_pcb):
+    parser = k2p.PinoutParser(kicad_6_pcb)
+    footprints = parser.footprints()
+    assert [fp["name"] for fp in footprints] == [
+        "pinout:Origin",
+        "pinout:PinLabel",
+        "pinout:PinLabel",
+        "pinout:Annotation",
+        "pinout:PinLabel",
+    ]
+    assert footprints[0]["at"] == [0, 0]
+    assert "pinout_title" in parser.gr_text()
+
+
+def test_parse_sexpr_kicad_5_atoms():
+    data = b'(module Pkg:R_0.5mm (layer F.Cu) (at -1.5 2e1 90) (fp_text value "A \\"B\\""))'
+    assert k2p.parse_sexpr(data) == [
+        "module",
+        "Pkg:R_0.5mm",
+        ["layer", "F.Cu"],
+        ["at", "-1.5", "2e1", "90"],
+        ["fp_text", "value", '"A \\"B\\""'],
+    ]
+
+
+def test_pinout_parser_footprints_cached(kicad_6_pcb):
+    parser = k2p.PinoutParser(kicad_6_pcb)
+    footprints = parser.footprints()
+    assert parser.footprints() is footprints
+
+    # Modifying the file discards cached data
+    stat = kicad_6_pcb.stat()
+    os.utime(kicad_6_pcb, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert parser.footprints() is not footprints
+    assert parser.footprints() == footprints
+
+
+def test_pinout_parser_populate(kicad_6_pcb):
+    def labels(method):
+        parser = k2p.PinoutParser(kicad_6_pcb)
+        parser.link_image(Image(kicad_6_pcb.parent.parent / "pcb_graphic.svg"))
+        group = Group()
+        method(parser, group)
+        return sorted((type(c).__name__, c.x, c.y, c.scale) for c in group.children)
+
+    def add_separately(parser, group):
+        parser.add_pinlabels(group)
+        parser.add_annotations(group)
+
+    assert labels(k2p.PinoutParser.populate) == labels(add_separately)
+    assert len(labels(k2p.PinoutParser.populate)) == 4
@@ -0,0 +1,211 @@
+import contextlib
+import gzip
+import io
+import os
+import xml.dom.minidom
+from importlib import reload
+from pathlib import Path
+from pinout import config, core, image_tools, manager
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def test_split_export_args():
+    assert manager.split_export_args(["diagram.py", "out.svg"]) == (
+        "diagram.py",
+        ["out.svg"],
+        "diagram",
+    )
+    assert manager.split_export_args(
+        ["diagram.py", "out.svg", "out.png", "out.pdf", "board"]
+    ) == ("diagram.py", ["out.svg", "out.png", "out.pdf"], "board")
+
+
+def test_export_multiple_destinations(tmp_path, monkeypatch):
+    reload(config)
+    loads = []
+    get_diagram_instance = manager.get_diagram_instance
+
+    def counted(*args, **kwargs):
+        loads.append(args)
+        return get_diagram_instance(*args, **kwargs)
+
+    monkeypatch.setattr(manager, "get_diagram_instance", counted)
+
+    dest_01 = tmp_path / "diagram.svg"
+    dest_02 = tmp_path / "nested" / "diagram.svg"
+    manager.export_diagram(RESOURCES / "diagram_image.py", [dest_01, dest_02])
+
+    assert len(loads) == 1
+    # Linked media is relative to each destination
+    for dest in (dest_01, dest_02):
+        href = os.path.relpath(RESOURCES / "200x200.png", dest.parent)
+        assert f'href="{Path(href).as_posix()}"' in dest.read_text()
+
+
+def test_batch_jobs_from_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(
+        "# script, destinations, instance name\n"
+        "\n"
+        "boards/a.py out/a.svg out/a.png\n"
+        "boards/b.py out/b.svg board_b\n"
+        "'my boards/c.py' 'out/my c.svg'\n"
+    )
+    assert manager.batch_jobs(manifest) == [
+        (
+            tmp_path / "boards/a.py",
+            [tmp_path / "out/a.svg", tmp_path / "out/a.png"],
+            "diagram",
+        ),
+        (tmp_path / "boards/b.py", [tmp_path / "out/b.svg"], "board_b"),
+        (tmp_path / "my boards/c.py", [tmp_path / "out/my c.svg"], "diagram"),
+    ]
+
+
+def test_batch_jobs_from_absolute_glob(tmp_path):
+    (tmp_path / "boards").mkdir()
+    (tmp_path / "boards/a.py").touch()
+    jobs = manager.batch_jobs(f"{tmp_path}/**/*.py", (".svg", ".png"))
+    assert jobs == [
+        (
+            tmp_path / "boards/a.py",
+            [tmp_path / "boards/a.svg", tmp_path / "boards/a.png"],
+            "diagram",
+        )
+    ]
+
+
+def test_batch_export(tmp_path):
+    jobs = [
+        (RESOURCES / "diagram_export.py", [tmp_path / "export.svg"], "diagram"),
+        (RESOURCES / "diagram_image.py", [tmp_path / "image.svg"], "diagram"),
+        (RESOURCES / "diagram_image.py", [tmp_path / "missing.svg"], "missing"),
+    ]
+    results = manager.batch_export(jobs, processes=2)
+
+    errors = {result.dest[0].name: result.error for result in results}
+    assert errors["export.svg"] is None
+    assert errors["image.svg"] is None
+    assert "AttributeError" in errors["missing.svg"]
+    assert "<svg" in (tmp_path / "export.svg").read_text()
+
+
+def test_export_svgz_and_minify(tmp_path):
+    reload(config)
+    src = RESOURCES / "diagram_image.py"
+    svg = tmp_path / "diagram.svg"
+    svgz = tmp_path / "diagram.svgz"
+    manager.export_diagram(src, [svg, svgz])
+    assert gzip.decompress(svgz.read_bytes()).decode("utf-8") == svg.read_text()
+
+    minified = tmp_path / "minified.svgz"
+    manager.export_diagram(src, minified, minify=True)
+    markup = gzip.decompress(minified.read_bytes()).decode("utf-8")
+    assert len(markup) < len(svg.read_text())
+    assert "\n" not in markup and "><" in markup
+    assert (
+        f'href="{Path(os.path.relpath(RESOURCES, tmp_path)).as_posix()}/200x200.png"'
+        in (markup)
+    )
+    xml.dom.minidom.parseString(markup)
+    # Settings are restored after exporting
+    assert config.output["compact"] is False
+
+
+def test_export_skipped_when_unchanged(tmp_path, monkeypatch):
+    reload(config)
+    monkeypatch.setattr(manager, "build_records", image_tools.ContentCache())
+    monkeypatch.setattr(manager, "build_artifacts", image_tools.ContentCache())
+    loads = []
+    get_diagram_instance = manager.get_diagram_instance
+
+    def counted(*args, **kwargs):
+        loads.append(args)
+        return get_diagram_instance(*args, **kwargs)
+
+    monkeypatch.setattr(manager, "get_diagram_instance", counted)
+
+    for name in ("diagram_image.py", "200x200.png", "200x200.svg"):
+        (tmp_path / name).write_bytes((RESOURCES / name).read_bytes())
+    src = tmp_path / "diagram_image.py"
+    dest = tmp_path / "out" / "diagram.svg"
+
+    manager.export_diagram(src, dest, overwrite=True)
+    markup = dest.read_text()
+    manager.export_diagram(src, dest, overwrite=True)
+    assert len(loads) == 1
+
+    # Deleted or modified files are restored without running the script
+    dest.unlink()
+    manager.export_diagram(src, dest, overwrite=True)
+    dest.write_text("modified")
+    manager.export_diagram(src, dest, overwrite=True)
+    assert len(loads) == 1
+    assert dest.read_text() == markup
+
+    # Changed inputs, or force, export again
+    with (tmp_path / "200x200.svg").open("a") as f:
+        f.write("\n")
+    manager.export_diagram(src, dest, overwrite=True)
+    assert len(loads) == 2
+    manager.export_diagram(src, dest, overwrite=True, force=True)
+    assert len(loads) == 3
+
+
+def test_export_skipped_when_script_sets_config(tmp_path):
+    src = tmp_path / "diagram_config.py"
+    src.write_text(
+        "from pinout import config\n"
+        "from pinout.components.layout import Diagram\n"
+        "config.output['precision'] = 2\n"
+        "diagram = Diagram(100, 100)\n"
+    )
+    dest = tmp_path / "diagram.svg"
+    outputs = []
+    try:
+        for _ in range(2):
+            # Each run starts from the default config, as a new process would
+            reload(config)
+            config.cache["dir"] = tmp_path / "cache"
+            outputs.append(io.StringIO())
+            with contextlib.redirect_stdout(outputs[-1]):
+                manager.export_diagram(src, dest, overwrite=True)
+    finally:
+        reload(config)
+    assert "exported successfully" in outputs[0].getvalue()
+    assert "is up to date" in outputs[1].getvalue()
+
+
+def test_export_repeated_when_data_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(manager, "build_records", image_tools.ContentCache())
+    monkeypatch.setattr(manager, "build_artifacts", image_tools.ContentCache())
+    src = tmp_path / "diagram_data.py"
+    src.write_text(
+        "from pinout.components.layout import Diagram\n"
+        "with open('size.txt') as f:\n"
+        "    size = int(f.read())\n"
+        "diagram = Diagram(size, size)\n"
+    )
+    data = tmp_path / "size.txt"
+    data.write_text("100")
+    dest = tmp_path / "diagram.svg"
+    outputs = []
+    for size in ("100", "100", "200"):
+        data.write_text(size)
+        outputs.append(io.StringIO())
+        with contextlib.redirect_stdout(outputs[-1]):
+            manager.export_diagram(src, dest, overwrite=True)
+    assert "exported successfully" in outputs[0].getvalue()
+    assert "is up to date" in outputs[1].getvalue()
+    assert "exported successfully" in outputs[2].getvalue()
+    assert 'width="200"' in dest.read_text()
+
+
+def test_build_inputs_unknown_reads(tmp_path):
+    src = tmp_path / "diagram.py"
+    src.write_text("")
+    components = {core.Image: [], core.StyleSheet: []}
+    assert src in map(Path, manager.build_inputs(src, components, set()))
+    # Files read by the script were not recorded, the build is not either
+    assert manager.build_inputs(src, components, None) is None
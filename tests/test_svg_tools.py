@@ -0,0 +1,59 @@
+import pytest
+from pinout import config, svg_tools
+
+
+@pytest.mark.parametrize(
+    "value, decimals, expected",
+    [
+        (123.45678901234, 3, "123.457"),
+        (2.0, 3, "2"),
+        (-0.0001, 3, "0"),
+        (1e-07, 2, "0"),
+        (15.5, 0, "16"),
+        (10, 2, "10"),
+    ],
+)
+def test_format_number(value, decimals, expected):
+    assert svg_tools.format_number(value, decimals) == expected
+
+
+def test_minify_markup():
+    markup = """
+    <g
+        class="label 1.23456"
+        transform="
+            translate(10.123456 -2.5e-05)
+            scale(1 1)
+        "
+    >
+        <path d="M 0.33333333 1 L 2.0 3"   />
+        <text>  A  >  1.23456  </text>
+    </g>
+    """
+    assert svg_tools.minify_markup(markup, 2) == (
+        '<g class="label 1.23456" transform="translate(10.12 0) scale(1 1)">'
+        '<path d="M 0.33 1 L 2 3"/><text> A > 1.23456 </text></g>'
+    )
+
+
+def test_minify_tags_split_between_chunks():
+    chunks = ['<svg>\n  <rect width="1.00', '01" height="2"', "/>\n</svg>"]
+    assert "".join(svg_tools.minify(chunks)) == (
+        '<svg><rect width="1" height="2"/></svg>'
+    )
+
+
+def test_minify_follows_output_precision(monkeypatch):
+    chunks = ['<rect width="1.23456"/>']
+    assert "".join(svg_tools.minify(chunks)) == '<rect width="1.235"/>'
+    monkeypatch.setitem(config.output, "precision", 1)
+    assert "".join(svg_tools.minify(chunks)) == '<rect width="1.2"/>'
+
+
+def test_number_formatter(monkeypatch):
+    assert svg_tools.number_formatter(None) is str
+    assert svg_tools.number_formatter(2) is svg_tools.number_formatter(2)
+    monkeypatch.setitem(config.output, "precision", 1)
+    fmt = svg_tools.formatter()
+    assert [fmt(v) for v in (1 / 3, -0.04, 5, 2.96)] == ["0.3", "0", "5", "3"]
+    assert [fmt(v) for v in ("100%", "auto")] == ["100%", "auto"]
@@ -0,0 +1,88 @@
+import math
+import pytest
+from pinout.components.leaderline import Straight
+from pinout.core import Group, Rect
+from pinout.transform import Transform, trig
+
+
+def test_compose_applies_right_hand_first():
+    move = Transform.translation(10, 5)
+    scale = Transform.scaling(2, 3)
+    rotate = Transform.rotation(90)
+
+    points = [(0, 0), (1, 2), (-3, 4)]
+    composed = (move @ scale @ rotate).apply_all(points)
+    for (x, y), point in zip(composed, points):
+        expected = move.apply(*scale.apply(*rotate.apply(*point)))
+        assert (x, y) == pytest.approx(expected)
+
+
+def test_rotation_around_origin():
+    rotate = Transform.rotation(90, origin=(10, 10))
+    assert rotate.apply(10, 10) == pytest.approx((10, 10))
+    assert rotate.apply(20, 10) == pytest.approx((10, 20))
+    assert rotate.bounds((10, 10, 20, 15)) == pytest.approx((5, 10, 10, 20))
+    assert trig(90) is trig(90)
+
+
+def test_component_transform_cached():
+    rect = Rect(x=10, y=20, width=10, height=10, rotate=30)
+    transform = rect.transform
+    assert rect.transform is transform
+    cos, sin = math.cos(math.radians(30)), math.sin(math.radians(30))
+    assert transform.apply(1, 0) == pytest.approx((10 + cos, 20 + sin))
+
+    rect.rotate = 0
+    assert rect.transform is not transform
+    assert rect.bounding_coords() == (10, 20, 20, 30)
+
+
+def test_inverse_and_skew():
+    transform = (
+        Transform.translation(3, 4) @ Transform.skew(x=30) @ Transform.rotation(20)
+    )
+    assert transform.inverse().apply(*transform.apply(5, 6)) == pytest.approx((5, 6))
+    assert Transform.skew(x=45).apply(0, 10) == pytest.approx((10, 10))
+    assert Transform.skew(y=45).apply(10, 0) == pytest.approx((10, 10))
+
+
+def test_bounding_coords_honour_matrix_and_skew():
+    rect = Rect(x=10, y=20, width=10, height=10)
+    assert rect.extra_transform() is None
+    rect.skewx = 45
+    assert rect.bounding_coords() == pytest.approx((10, 20, 30, 30))
+    rect.skewx = None
+    rect.translate = (5, 0)
+    assert rect.bounding_coords() == (15, 20, 25, 30)
+
+    group = Group(x=100, matrix=(2, 0, 0, 2, 0, 0))
+    group.add(Rect(width=10, height=10))
+    assert group.bounding_coords() == (100, 0, 120, 20)
+    assert "rotate(0) matrix(2 0 0 2 0 0)\n" in group.render()
+
+
+def test_world_transform_propagates():
+    outer = Group(x=100, y=50, scale=(2, 2))
+    inner = outer.add(Group(x=10, y=0, rotate=90))
+    rect = inner.add(Rect(x=5, y=0, width=10, height=4))
+
+    world = rect.world_transform
+    assert rect.world_transform is world
+    assert world.apply(0, 0) == pytest.approx((120, 60))
+    assert rect.world_bounding_coords() == pytest.approx((112, 60, 120, 80))
+
+    # Moving an ancestor recomputes descendants
+    outer.x = 0
+    assert rect.world_transform is not world
+    assert rect.world_transform.apply(0, 0) == pytest.approx((20, 60))
+
+
+def test_leaderline_routes_across_layouts():
+    left = Group(x=0, y=0)
+    right = Group(x=100, y=50)
+    origin = left.add(Rect(width=10, height=10))
+    destination = right.add(Rect(width=10, height=10))
+
+    line = Straight(direction="hh")
+    line.route(origin, destination)
+    assert (line.start, line.end) == ((10, 5), (100, 55))